@@ -1,10 +1,25 @@
 from django.urls import path
-from . import views
 
+from core.decorators import stampede_cache_page
+from . import views
 
 app_name = 'about'
 
+ABOUT_CACHE_TIMEOUT = 60 * 60
+
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/',
+        stampede_cache_page(ABOUT_CACHE_TIMEOUT, 'about')(
+            views.AboutAuthorView.as_view()
+        ),
+        name='author',
+    ),
+    path(
+        'tech/',
+        stampede_cache_page(ABOUT_CACHE_TIMEOUT, 'about')(
+            views.AboutTechView.as_view()
+        ),
+        name='tech',
+    ),
 ]
@@ -0,0 +1,293 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим кешем.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.layered.LayeredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'LOCAL_MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+        },
+        'shared': {
+            'BACKEND': 'core.cache.sqlite.SQLiteCache',
+            'LOCATION': '/srv/yatube/cache.sqlite3',
+        },
+    }
+
+LOCATION — имя кеша из CACHES, который служит общим уровнем. Чтения,
+попавшие в локальный уровень, не трогают общий: нет ни сериализации,
+ни ввода-вывода. Записи идут в общий уровень сразу.
+
+Согласованность держится на «эпохе» в общем кеше. delete, incr, decr,
+touch и clear увеличивают её и записывают под номером новой эпохи,
+какие ключи изменились. Каждый процесс сверяет эпоху в начале запроса
+и не реже раза в EPOCH_INTERVAL секунд и убирает из локального уровня
+только эти ключи. Весь локальный уровень сбрасывается после clear,
+если процесс отстал больше чем на MAX_INVALIDATIONS эпох или запись
+об изменении уже вытеснена. Перезапись ключа через set эпоху не
+трогает: устаревшее значение в других процессах живёт не дольше
+LOCAL_TIMEOUT, а set с нулевым сроком убирает ключ только из
+локального уровня своего процесса.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+EPOCH_KEY = 'layered:epoch'
+INVALIDATED_KEY = 'layered:invalidated:{}'
+INVALIDATION_TIMEOUT = 5 * 60
+MAX_INVALIDATIONS = 100
+STATS_KEY = 'layered:stats:{}'
+TIERS = ('local_hits', 'shared_hits', 'misses')
+
+
+def _fresh_epoch():
+    # Эпоха, созданная заново (после clear или вытеснения), не должна
+    # совпасть с той, что запомнил какой-нибудь процесс.
+    return time.time_ns()
+
+
+class LayeredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._epoch_interval = float(options.get('EPOCH_INTERVAL', 1))
+        self._stats_flush_every = int(options.get('STATS_FLUSH_EVERY', 1000))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = None
+        self._epoch_checked_at = 0
+        self._stats = dict.fromkeys(TIERS, 0)
+        self._unflushed = dict.fromkeys(TIERS, 0)
+        request_started.connect(self._request_started, weak=True)
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _request_started(self, **kwargs):
+        self._epoch_checked_at = 0
+
+    def _check_epoch(self):
+        now = time.monotonic()
+        if now - self._epoch_checked_at < self._epoch_interval:
+            return
+        self._epoch_checked_at = now
+        epoch = self.shared.get(EPOCH_KEY)
+        if epoch is None:
+            self.shared.add(EPOCH_KEY, _fresh_epoch(), None)
+            epoch = self.shared.get(EPOCH_KEY, 0)
+        if epoch != self._epoch:
+            self._forget(self._invalidated_since(epoch))
+            self._epoch = epoch
+
+    def _invalidated_since(self, epoch):
+        """Ключи, изменённые после self._epoch; None — неизвестно какие."""
+        if self._epoch is None:
+            return None
+        if not 0 < epoch - self._epoch <= MAX_INVALIDATIONS:
+            return None
+        log = [INVALIDATED_KEY.format(number)
+               for number in range(self._epoch + 1, epoch + 1)]
+        found = self.shared.get_many(log)
+        keys = []
+        for name in log:
+            if found.get(name) is None:
+                return None
+            keys.extend(found[name])
+        return keys
+
+    def _forget(self, keys):
+        with self._lock:
+            if keys is None:
+                self._local.clear()
+                return
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _bump_epoch(self, keys=None):
+        """Сообщает всем процессам об изменении keys; None — всех ключей."""
+        try:
+            epoch = self.shared.incr(EPOCH_KEY)
+        except ValueError:
+            self.shared.add(EPOCH_KEY, _fresh_epoch(), None)
+        else:
+            self.shared.set(
+                INVALIDATED_KEY.format(epoch), keys, INVALIDATION_TIMEOUT
+            )
+        self._forget(keys)
+        self._epoch_checked_at = 0
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._local[key]
+                return False, None
+            self._local.move_to_end(key)
+            return True, value
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self._local_timeout_for(timeout)
+        if timeout <= 0:
+            with self._lock:
+                self._local.pop(key, None)
+            return
+        with self._lock:
+            self._local[key] = (time.monotonic() + timeout, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_timeout_for(self, timeout):
+        if timeout == DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _count(self, tier, amount=1):
+        self._stats[tier] += amount
+        self._unflushed[tier] += amount
+        if sum(self._unflushed.values()) >= self._stats_flush_every:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Переносит счётчики процесса в общий кеш."""
+        unflushed, self._unflushed = self._unflushed, dict.fromkeys(TIERS, 0)
+        for tier, amount in unflushed.items():
+            if not amount:
+                continue
+            key = STATS_KEY.format(tier)
+            self.shared.add(key, 0, None)
+            try:
+                self.shared.incr(key, amount)
+            except ValueError:
+                self.shared.set(key, amount, None)
+
+    def stats(self, site_wide=False):
+        """Доли попаданий по уровням: в этом процессе или по всем сразу."""
+        if site_wide:
+            self.flush_stats()
+            counts = {
+                tier: self.shared.get(STATS_KEY.format(tier), 0)
+                for tier in TIERS
+            }
+        else:
+            counts = dict(self._stats)
+        total = sum(counts.values())
+        ratios = {
+            name: counts[tier] / total if total else 0.0
+            for name, tier in (
+                ('local_hit_ratio', 'local_hits'),
+                ('shared_hit_ratio', 'shared_hits'),
+                ('miss_ratio', 'misses'),
+            )
+        }
+        return {**counts, 'total': total, **ratios}
+
+    def reset_stats(self):
+        self._stats = dict.fromkeys(TIERS, 0)
+        self._unflushed = dict.fromkeys(TIERS, 0)
+        self.shared.delete_many([STATS_KEY.format(tier) for tier in TIERS])
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self._check_epoch()
+        found, value = self._local_get(key)
+        if found:
+            self._count('local_hits')
+            return value
+        found = self.shared.get_many([key], version=0)
+        if key not in found:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        self._local_set(key, found[key])
+        return found[key]
+
+    def get_many(self, keys, version=None):
+        keys_map = {self.make_key(key, version=version): key for key in keys}
+        self._check_epoch()
+        result = {}
+        missing = []
+        for key in keys_map:
+            found, value = self._local_get(key)
+            if found:
+                result[keys_map[key]] = value
+            else:
+                missing.append(key)
+        self._count('local_hits', len(result))
+        if missing:
+            found = self.shared.get_many(missing, version=0)
+            self._count('shared_hits', len(found))
+            self._count('misses', len(missing) - len(found))
+            for key, value in found.items():
+                self._local_set(key, value)
+                result[keys_map[key]] = value
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.shared.set(key, value, timeout, version=0)
+        self._local_set(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {
+            self.make_key(key, version=version): value
+            for key, value in data.items()
+        }
+        failed = self.shared.set_many(data, timeout, version=0)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        added = self.shared.add(key, value, timeout, version=0)
+        if added:
+            self._local_set(key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        touched = self.shared.touch(key, timeout, version=0)
+        self._bump_epoch([key])
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        try:
+            return self.shared.incr(key, delta, version=0)
+        finally:
+            self._bump_epoch([key])
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self._check_epoch()
+        found, _ = self._local_get(key)
+        return found or self.shared.has_key(key, version=0)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.shared.delete(key, version=0)
+        self._bump_epoch([key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        self.shared.delete_many(keys, version=0)
+        self._bump_epoch(keys)
+
+    def clear(self):
+        self.shared.clear()
+        self._bump_epoch()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,291 @@
+"""Кеш на SQLite в режиме WAL, общий для всех процессов на одном хосте.
+
+В отличие от LocMemCache, все воркеры gunicorn видят одни и те же
+записи, а cache.clear() очищает кеш для всех. Внешний сервер не нужен:
+хватает файла на локальном диске.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.sqlite.SQLiteCache',
+            'LOCATION': '/srv/yatube/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+Поддерживаются TTL, атомарный incr (запись под блокировкой
+BEGIN IMMEDIATE), get_many/set_many одним запросом или транзакцией и
+приблизительное LRU-вытеснение: время обращения обновляется не чаще
+раза в ACCESS_RESOLUTION секунд, чтобы чтения не превращались в записи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# Предел числа параметров в одном запросе у старых сборок SQLite.
+MAX_VARIABLES = 999
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._mmap_size = int(options.get('MMAP_SIZE', 64 * 1024 * 1024))
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', 60)
+        )
+        # Размер таблицы проверяется не на каждой записи: COUNT(*) в
+        # SQLite проходит по всему индексу.
+        self._cull_every = max(1, self._max_entries // 100)
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # После fork соединение родителя использовать нельзя.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._prepare_file()
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = pid
+        return self._local.db
+
+    def _prepare_file(self):
+        # Записи читаются через pickle.loads: файл, подложенный другим
+        # пользователем, означал бы выполнение его кода.
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        descriptor = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            owner = os.fstat(descriptor).st_uid
+        finally:
+            os.close(descriptor)
+        if owner != os.getuid():
+            raise ImproperlyConfigured(
+                f'Файл кеша {self._path} принадлежит другому пользователю.'
+            )
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _write(self, sql, params=()):
+        self._db.execute(sql, params)
+        self._after_write(1)
+
+    def _after_write(self, count):
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[0], now):
+                db.execute('COMMIT')
+                return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (key, self._dumps(value),
+                 self.get_backend_timeout(timeout), now),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._after_write(1)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._get_many([key])
+        if key not in found:
+            return default
+        return found[key]
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys_map))
+        return {keys_map[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows = self._db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({placeholders(chunk)})',
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if self._expired(expires, now):
+                    continue
+                found[key] = pickle.loads(value)
+                if accessed < now - self._access_resolution:
+                    stale.append(key)
+        for start in range(0, len(stale), MAX_VARIABLES):
+            chunk = stale[start:start + MAX_VARIABLES]
+            self._db.execute(
+                'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({placeholders(chunk)})',
+                [now, *chunk],
+            )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+            (key, self._dumps(value),
+             self.get_backend_timeout(timeout), time.time()),
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self._key(key, version), self._dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._after_write(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._dumps(value), now, key),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and not self._expired(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                chunk,
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока: открывать его на
+        # каждый запрос дороже, чем держать.
+        pass
+
+    def _cull(self):
+        now = time.time()
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        excess = max(
+            count - self._max_entries, count // self._cull_frequency
+        )
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,),
+        )
+
+    @staticmethod
+    def _expired(expires, now):
+        return expires is not None and expires <= now
@@ -0,0 +1,105 @@
+"""Защита от «эффекта толпы» при пересчёте закешированных значений.
+
+Когда запись истекает, все одновременные запросы разом бросаются её
+пересчитывать. Здесь это сглаживается тремя приёмами, которые
+настраиваются отдельно для каждого имени фрагмента в
+settings.CACHE_STAMPEDE:
+
+* lock — пересчитывает только один процесс (single-flight), остальные
+  ждут готового значения не дольше wait секунд;
+* stale — сколько секунд после истечения можно отдавать старое
+  значение, пока кто-то один его пересчитывает;
+* beta — вероятностное досрочное истечение (XFetch): чем ближе срок
+  и чем дольше считается значение, тем вероятнее пересчёт заранее.
+  0 отключает.
+"""
+import math
+import random
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+DEFAULT_POLICY = {
+    'lock': True,
+    'stale': 0,
+    'beta': 0.0,
+    'lock_timeout': 10,
+    'wait': 2.0,
+    'poll': 0.05,
+}
+
+Entry = namedtuple('Entry', ('value', 'expires', 'delta'))
+
+
+def policy_for(name):
+    config = getattr(settings, 'CACHE_STAMPEDE', {})
+    return {
+        **DEFAULT_POLICY,
+        **config.get('default', {}),
+        **config.get(name, {}),
+    }
+
+
+def get_or_set(cache, key, compute, timeout, policy):
+    """Возвращает значение по ключу, пересчитывая его не более раза."""
+    now = time.time()
+    entry = cache.get(key)
+    if not isinstance(entry, Entry):
+        entry = None
+    if entry is not None and not _should_refresh(entry, policy, now):
+        return entry.value
+    if not policy['lock']:
+        return _compute(cache, key, compute, timeout, policy)
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, policy['lock_timeout']):
+        try:
+            return _compute(cache, key, compute, timeout, policy)
+        finally:
+            # Блокировка снимается записью с нулевым сроком, а не delete:
+            # в двухуровневом кеше delete ещё сдвигает общую эпоху и пишет
+            # журнал изменённых ключей, а замок проверяется только через
+            # add в общем уровне, так что другим процессам знать о нём
+            # незачем.
+            cache.set(lock_key, 0, 0)
+    if entry is not None:
+        # Значение пересчитывает другой процесс, пока отдаём прежнее.
+        return entry.value
+    deadline = now + policy['wait']
+    while time.time() < deadline:
+        time.sleep(policy['poll'])
+        entry = cache.get(key)
+        if isinstance(entry, Entry):
+            return entry.value
+    return _compute(cache, key, compute, timeout, policy)
+
+
+def _should_refresh(entry, policy, now):
+    if entry.expires is None:
+        return False
+    if policy['beta'] > 0:
+        # XFetch: -log(random()) > 0, поэтому срок сдвигается назад.
+        now -= entry.delta * policy['beta'] * math.log(
+            1 - random.random()
+        )
+    return now >= entry.expires
+
+
+def _compute(cache, key, compute, timeout, policy):
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    if value is None:
+        # Как и BaseCache.get_or_set, None не кешируется.
+        return value
+    if timeout is None:
+        cache.set(key, Entry(value, None, delta), None)
+    else:
+        # Запись живёт в кеше дольше своего срока на stale секунд,
+        # чтобы её можно было отдавать во время пересчёта.
+        cache.set(
+            key,
+            Entry(value, time.time() + timeout, delta),
+            timeout + policy['stale'],
+        )
+    return value
@@ -0,0 +1,57 @@
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_response_headers
+
+from core.cache.stampede import get_or_set, policy_for
+
+
+def query_budget(max_queries):
+    """Объявляет, сколько SQL-запросов может выполнить представление.
+
+    Бюджет не зависит от числа записей на странице и проверяется тестами.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def stampede_cache_page(timeout, name):
+    """Кеширует страницу для анонимных GET-запросов.
+
+    Пересчёт страницы защищён политикой name из settings.CACHE_STAMPEDE.
+    Ответы с cookie и статусом, отличным от 200, не кешируются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            uncacheable = []
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                if response.status_code != 200 or response.cookies:
+                    uncacheable.append(response)
+                    return None
+                return response
+
+            response = get_or_set(
+                cache,
+                f'page:{name}:{request.get_full_path()}',
+                render,
+                timeout,
+                policy_for(name),
+            )
+            if response is None:
+                if uncacheable:
+                    return uncacheable[0]
+                return view(request, *args, **kwargs)
+            patch_response_headers(response, timeout)
+            return response
+        return wrapper
+    return decorator
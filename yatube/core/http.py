@@ -0,0 +1,163 @@
+"""Отдача файлов с диска с условными запросами и Range.
+
+Если перед Django стоит веб-сервер, передачу байтов лучше отдать ему:
+settings.MEDIA_SENDFILE = 'x-sendfile' (Apache, lighttpd) или
+'x-accel-redirect' (nginx, внутренний location MEDIA_ACCEL_PREFIX,
+смотрящий в MEDIA_ROOT). Django тогда только проверяет доступ и
+отвечает на условные запросы, а тело и Range обрабатывает сервер.
+
+Без этого файл отдаётся через FileResponse, в том числе по частям:
+WSGI-сервер с wsgi.file_wrapper (например, gunicorn) передаёт его
+через sendfile без копирования в Python, остальные читают кусками.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+)
+from django.utils.http import http_date, parse_etags, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+X_SENDFILE = 'x-sendfile'
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Для файлов, имя которых меняется вместе с содержимым.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat):
+    return quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+
+
+def parse_range(header, size):
+    """Возвращает (start, end) включительно или None — отдать весь файл.
+
+    Поддерживается один диапазон; несколько диапазонов и нераспознанный
+    заголовок дают полный ответ, как разрешает RFC 7233.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-N — последние N байт.
+        length = int(last)
+        if not length:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable
+    if start > end:
+        return None
+    return start, end
+
+
+def serve_file(request, path, cache_control=IMMUTABLE):
+    """Отдаёт файл по абсолютному пути с ETag, If-None-Match и Range."""
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    etag = file_etag(stat)
+    matches = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in matches or '*' in matches:
+        response = HttpResponseNotModified()
+    else:
+        response = (
+            _offloaded_response(path)
+            or _file_response(request, path, stat, etag)
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def _offloaded_response(path):
+    """Ответ без тела, который веб-сервер заполнит файлом сам."""
+    mode = getattr(settings, 'MEDIA_SENDFILE', '')
+    if mode == X_SENDFILE:
+        response = HttpResponse(content_type=_content_type(path))
+        response['X-Sendfile'] = path
+        return response
+    if mode == X_ACCEL_REDIRECT:
+        name = os.path.relpath(path, settings.MEDIA_ROOT)
+        if name.startswith(os.pardir):
+            return None
+        response = HttpResponse(content_type=_content_type(path))
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(name.replace(os.sep, '/'))
+        )
+        return response
+    return None
+
+
+def _file_response(request, path, stat, etag):
+    content_type = _content_type(path)
+    size = stat.st_size
+    if_range = request.META.get('HTTP_IF_RANGE')
+    try:
+        # Range с устаревшим If-Range означает запрос всего файла.
+        byte_range = None if if_range and if_range != etag else parse_range(
+            request.META.get('HTTP_RANGE'), size
+        )
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416, content_type=content_type)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+    start, end = byte_range
+    response = FileResponse(
+        FileRange(open(path, 'rb'), start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response.block_size = CHUNK_SIZE
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+class FileRange:
+    """Часть открытого файла длиной length байт от позиции start.
+
+    read() не выходит за конец диапазона. fileno() отдаёт дескриптор,
+    уже сдвинутый на start: wsgi.file_wrapper отправит с этой позиции
+    ровно Content-Length байт.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        chunk = self.file.read(size)
+        self.remaining -= len(chunk)
+        return chunk
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
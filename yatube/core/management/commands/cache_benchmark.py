@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import (
+    Command as CreateCacheTable,
+)
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from core.cache.sqlite import SQLiteCache
+
+BENCHMARK_TABLE = 'cache_benchmark'
+# Примерно как фрагмент ленты из десяти постов.
+VALUE = 'x' * 4096
+
+
+def read_after_fork(cache, ready, result):
+    """Дочерний «воркер»: ждёт записи родителя и читает ключ."""
+    connections.close_all()
+    ready.wait()
+    result.put(cache.get('shared') == VALUE)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLiteCache с LocMemCache, FileBasedCache и '
+        'DatabaseCache: операции в секунду и видимость записей между '
+        'процессами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=2000,
+            help='Сколько раз повторить каждую операцию',
+        )
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': operations * 20}}
+        create_table = CreateCacheTable()
+        create_table.verbosity = 0
+        create_table.create_table(DEFAULT_DB_ALIAS, BENCHMARK_TABLE, False)
+        backends = {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(
+                os.path.join(directory, 'files'), params
+            ),
+            'database': DatabaseCache(BENCHMARK_TABLE, params),
+            'sqlite': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params
+            ),
+        }
+        try:
+            self.stdout.write(
+                f'{"backend":<10} {"set/s":>9} {"get/s":>9} '
+                f'{"get_many/s":>11} {"incr/s":>9} {"shared":>7}'
+            )
+            for name, cache in backends.items():
+                rates = self.measure(cache, operations)
+                shared = self.shared_between_processes(cache)
+                self.stdout.write(
+                    f'{name:<10} {rates[0]:>9.0f} {rates[1]:>9.0f} '
+                    f'{rates[2]:>11.0f} {rates[3]:>9.0f} '
+                    f'{"yes" if shared else "no":>7}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DROP TABLE ' + connection.ops.quote_name(BENCHMARK_TABLE)
+                )
+
+    def measure(self, cache, operations):
+        keys = [f'key{i}' for i in range(operations)]
+        rates = []
+        start = time.perf_counter()
+        for key in keys:
+            cache.set(key, VALUE)
+        rates.append(operations / (time.perf_counter() - start))
+        start = time.perf_counter()
+        for key in keys:
+            cache.get(key)
+        rates.append(operations / (time.perf_counter() - start))
+        start = time.perf_counter()
+        for i in range(0, operations, 10):
+            cache.get_many(keys[i:i + 10])
+        rates.append(operations / 10 / (time.perf_counter() - start))
+        cache.set('counter', 0)
+        start = time.perf_counter()
+        for _ in range(operations):
+            cache.incr('counter')
+        rates.append(operations / (time.perf_counter() - start))
+        return rates
+
+    def shared_between_processes(self, cache):
+        context = multiprocessing.get_context('fork')
+        ready = context.Event()
+        result = context.Queue()
+        cache.delete('shared')
+        worker = context.Process(
+            target=read_after_fork, args=(cache, ready, result)
+        )
+        worker.start()
+        cache.set('shared', VALUE)
+        ready.set()
+        shared = result.get(timeout=30)
+        worker.join()
+        return shared
@@ -0,0 +1,38 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache.layered import LayeredCache
+
+
+class Command(BaseCommand):
+    help = 'Показывает доли попаданий по уровням двухуровневого кеша'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not isinstance(cache, LayeredCache):
+            raise CommandError(
+                f'Кеш {options["alias"]} не двухуровневый'
+            )
+        stats = cache.stats(site_wide=True)
+        self.stdout.write(f'Обращений: {stats["total"]}')
+        self.stdout.write(
+            f'Локальный уровень: {stats["local_hit_ratio"]:.1%} '
+            f'({stats["local_hits"]})'
+        )
+        self.stdout.write(
+            f'Общий уровень: {stats["shared_hit_ratio"]:.1%} '
+            f'({stats["shared_hits"]})'
+        )
+        self.stdout.write(
+            f'Промахи: {stats["miss_ratio"]:.1%} ({stats["misses"]})'
+        )
+        if options['reset']:
+            cache.reset_stats()
@@ -0,0 +1,76 @@
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import (
+    Library, TemplateSyntaxError, VariableDoesNotExist,
+)
+from django.templatetags.cache import CacheNode, do_cache
+
+from core.cache.stampede import get_or_set, policy_for
+
+register = Library()
+
+
+class StampedeCacheNode(CacheNode):
+    """{% cache %} с защитой от одновременного пересчёта фрагмента.
+
+    Политика берётся из settings.CACHE_STAMPEDE по имени фрагмента.
+    """
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                '"cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError(
+                    '"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}'
+                )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_set(
+            self.fragment_cache(context),
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            policy_for(self.fragment_name),
+        )
+
+    def fragment_cache(self, context):
+        if self.cache_name:
+            try:
+                cache_name = self.cache_name.resolve(context)
+            except VariableDoesNotExist:
+                raise TemplateSyntaxError(
+                    '"cache" tag got an unknown variable: '
+                    f'{self.cache_name.var!r}'
+                )
+            try:
+                return caches[cache_name]
+            except InvalidCacheBackendError:
+                raise TemplateSyntaxError(
+                    'Invalid cache name specified for cache tag: '
+                    f'{cache_name!r}'
+                )
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+
+@register.tag('cache')
+def do_stampede_cache(parser, token):
+    """Замена {% cache %} с тем же синтаксисом."""
+    node = do_cache(parser, token)
+    return StampedeCacheNode(
+        node.nodelist,
+        node.expire_time_var,
+        node.fragment_name,
+        node.vary_on,
+        node.cache_name,
+    )
@@ -0,0 +1,203 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.cache.layered import LayeredCache
+from core.cache.sqlite import SQLiteCache
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 5000}}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'other'))
+
+    def test_file_is_private_and_must_be_ours(self):
+        self.cache.set('key', 1)
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o600)
+        other = SQLiteCache(self.location, {})
+        with mock.patch(
+            'core.cache.sqlite.os.getuid', return_value=os.getuid() + 1
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                other.get('key')
+
+    def test_timeout(self):
+        self.cache.set('key', 'value', timeout=0.2)
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertEqual(self.cache.get('key'), 'value')
+        time.sleep(0.3)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_many(self):
+        data = {f'key{i}': i for i in range(1500)}
+        self.assertEqual(self.cache.set_many(data), [])
+        self.assertEqual(self.cache.get_many(list(data) + ['missing']), data)
+        self.cache.delete_many(list(data))
+        self.assertEqual(self.cache.get_many(list(data)), {})
+
+    def test_shared_between_instances(self):
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 10,
+                'CULL_FREQUENCY': 2,
+                'ACCESS_RESOLUTION': 0,
+            },
+        })
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        time.sleep(0.01)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+
+class LayeredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(self.directory, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        params = {'OPTIONS': {'LOCAL_TIMEOUT': 60, 'EPOCH_INTERVAL': 0}}
+        # Два экземпляра над одним файлом — как два воркера.
+        self.first = LayeredCache('shared', params)
+        self.second = LayeredCache('shared', params)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertIsNone(self.second.get('missing'))
+        stats = self.second.stats()
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertAlmostEqual(stats['local_hit_ratio'], 1 / 3)
+
+    def test_local_tier_skips_shared_store(self):
+        self.first.set('key', 'value')
+        self.first.get('key')
+        # Подмена значения в обход слоя: локальный уровень его не видит.
+        caches['shared'].set('key', 'changed', version=0)
+        self.assertEqual(
+            self.first.get('key'), 'value'
+        )
+
+    def test_invalidations_propagate_between_processes(self):
+        self.first.set('counter', 1)
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('counter'), 1)
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.incr('counter')
+        self.assertEqual(self.second.get('counter'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_incr_keeps_other_local_entries(self):
+        self.first.set('counter', 1)
+        self.first.set('key', 'value')
+        self.second.get('counter')
+        self.second.get('key')
+        caches['shared'].set('key', 'changed', version=0)
+        self.first.incr('counter')
+        self.assertEqual(self.second.get('counter'), 2)
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_lost_invalidation_clears_local_tier(self):
+        self.first.set('counter', 1)
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.first.incr('counter')
+        caches['shared'].clear()
+        caches['shared'].set('layered:epoch', 5)
+        self.assertIsNone(self.second.get('key'))
+
+    def test_set_with_zero_timeout_drops_local_value(self):
+        self.first.set('key', 'old')
+        self.first.get('key')
+        self.first.set('key', 'new', 0)
+        self.assertIsNone(self.first.get('key'))
+
+    def test_many(self):
+        self.first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.second.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.assertEqual(self.second.stats()['local_hits'], 2)
+
+    def test_site_wide_stats(self):
+        self.first.set('key', 'value')
+        self.first.get('key')
+        self.first.get('key')
+        self.second.get('key')
+        stats = self.first.stats(site_wide=True)
+        self.assertEqual(stats['local_hits'], 1)
+        stats = self.second.stats(site_wide=True)
+        self.assertEqual(stats['shared_hits'], 2)
+        self.assertEqual(stats['total'], 3)
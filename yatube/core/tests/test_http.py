@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from core.http import RangeNotSatisfiable, parse_range
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            'bytes=0-9': (0, 9),
+            'bytes=90-': (90, 99),
+            'bytes=-10': (90, 99),
+            'bytes=-500': (0, 99),
+            'bytes=50-500': (50, 99),
+            'bytes=0-1,5-6': None,
+            'items=0-1': None,
+            'bytes=9-0': None,
+            None: None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 100), expected)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(RangeNotSatisfiable):
+                    parse_range(header, 100)
@@ -0,0 +1,110 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache.stampede import (
+    DEFAULT_POLICY, Entry, get_or_set, policy_for,
+)
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+
+
+@override_settings(CACHES=LOCMEM)
+class StampedeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def policy(self, **options):
+        return {**DEFAULT_POLICY, **options}
+
+    def test_single_flight(self):
+        results = []
+
+        def worker():
+            results.append(get_or_set(
+                cache, 'key', self.compute(delay=0.2), 60,
+                self.policy(wait=5),
+            ))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        cache.set('key', Entry('old', time.time() - 1, 0), 60)
+        cache.add('key:lock', 1, 60)
+        value = get_or_set(
+            cache, 'key', self.compute('new'), 60, self.policy(stale=60)
+        )
+        self.assertEqual(value, 'old')
+        self.assertEqual(self.calls, 0)
+
+    def test_lock_holder_refreshes_stale_value(self):
+        cache.set('key', Entry('old', time.time() - 1, 0), 60)
+        value = get_or_set(
+            cache, 'key', self.compute('new'), 60, self.policy(stale=60)
+        )
+        self.assertEqual(value, 'new')
+        self.assertTrue(cache.add('key:lock', 1, 60))
+
+    def test_probabilistic_early_expiration(self):
+        cache.set('key', Entry('old', time.time() + 1, 100), 60)
+        with mock.patch('core.cache.stampede.random.random', return_value=0):
+            self.assertEqual(get_or_set(
+                cache, 'key', self.compute('new'), 60, self.policy(beta=0)
+            ), 'old')
+        with mock.patch('core.cache.stampede.random.random', return_value=0.9):
+            self.assertEqual(get_or_set(
+                cache, 'key', self.compute('new'), 60, self.policy(beta=1)
+            ), 'new')
+
+    @override_settings(CACHE_STAMPEDE={
+        'default': {'stale': 5},
+        'feed': {'beta': 2.0},
+    })
+    def test_policy_per_name(self):
+        self.assertEqual(policy_for('feed')['beta'], 2.0)
+        self.assertEqual(policy_for('feed')['stale'], 5)
+        self.assertEqual(policy_for('other')['beta'], DEFAULT_POLICY['beta'])
+
+    def test_template_tag(self):
+        template = Template(
+            '{% load stampede_cache %}'
+            '{% cache 60 fragment name %}{{ value }}{% endcache %}'
+        )
+        context = {'name': 'a', 'value': 'first'}
+        self.assertEqual(template.render(Context(context)), 'first')
+        context['value'] = 'second'
+        self.assertEqual(template.render(Context(context)), 'first')
+        context['name'] = 'b'
+        self.assertEqual(template.render(Context(context)), 'second')
+
+    def test_page_cached_for_guests(self):
+        url = reverse('about:author')
+        with mock.patch(
+            'about.views.AboutAuthorView.get_context_data',
+            autospec=True,
+            side_effect=lambda view, **kwargs: kwargs,
+        ) as get_context_data:
+            for _ in range(3):
+                self.assertEqual(Client().get(url).status_code, 200)
+        self.assertEqual(get_context_data.call_count, 1)
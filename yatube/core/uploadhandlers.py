@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+
+class BoundedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку кусками во временный файл, а не в память.
+
+    Больше FILE_UPLOAD_MAX_SIZE байт на диск не пишется, но размер
+    файла остаётся настоящим, и validate_upload_size отклоняет такую
+    загрузку в любой форме модели с этим валидатором.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.written = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        room = settings.FILE_UPLOAD_MAX_SIZE + 1 - self.written
+        if room > 0:
+            self.file.write(raw_data[:room])
+            self.written += min(room, len(raw_data))
+
+
+def validate_upload_size(file):
+    """Валидатор поля-файла: новая загрузка не больше FILE_UPLOAD_MAX_SIZE.
+
+    Уже сохранённые файлы не проверяются: их размер не менялся.
+    """
+    if getattr(file, '_committed', False):
+        return
+    if file.size > settings.FILE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.FILE_UPLOAD_MAX_SIZE)},
+        )
@@ -1,15 +1,41 @@
 from django.contrib import admin
+from . import search
 from .models import Post, Group, Comment
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо LIKE '%...%' по всей таблице.
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(pk__in=search.matching(search_term)), False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group':
+            # Список групп для list_editable читается один раз на страницу,
+            # а не по запросу на каждую строку.
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = list(formfield.choices)
+                request._group_choices = choices
+            formfield.choices = choices
+        return formfield
+
 
 admin.site.register(Group)
 admin.site.register(Comment)
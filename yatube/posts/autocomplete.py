@@ -0,0 +1,257 @@
+"""Автодополнение имён пользователей и групп по префиксу.
+
+В памяти процесса хранится отсортированный список ключей: логин, имя,
+фамилия и полное имя пользователя, slug и название группы (целиком и
+по словам) в нижнем регистре. Поиск по префиксу — это бинарный поиск
+начала диапазона и проход по нему до LIMIT разных объектов, без
+запросов к базе.
+
+Индекс строится одной сортировкой всех пар (ключ, объект). Сигналы
+сразу правят индекс своего процесса, увеличивают версию в общем кеше
+и кладут туда же само изменение под номером новой версии. Другие
+процессы, увидев новую версию, применяют пропущенные изменения по
+порядку. Полная пересборка в фоновом потоке нужна, только если
+изменений набралось больше MAX_CHANGES или какого-то нет в кеше
+(вытеснено или ещё не записано); до её конца процесс отвечает по
+прежнему индексу. Первая сборка тоже идёт в фоне, её запускает первый
+запрос к процессу; пока индекса нет, ответ пустой и неполный. Ответ
+укладывается в BUDGET секунд: если время вышло, возвращается то, что
+успели найти.
+"""
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connections
+from django.urls import reverse
+
+from . import cache_versions
+from .models import Group, User
+
+LIMIT = 10
+BUDGET = 0.05
+VERSION = ('autocomplete', 0)
+CHANGE_KEY = 'autocomplete:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+MAX_CHANGES = 1000
+USER = 'user'
+GROUP = 'group'
+
+Suggestion = namedtuple('Suggestion', ('kind', 'pk', 'name', 'label'))
+
+
+class PrefixIndex:
+    def __init__(self, entries=()):
+        """entries — пары (объект, его ключи); сортируются один раз."""
+        self.objects = {}
+        pairs = []
+        for suggestion, keys in entries:
+            keys = self._normalize(keys)
+            self.objects[suggestion.kind, suggestion.pk] = keys
+            pairs.extend(
+                (key, suggestion.kind, suggestion.pk, suggestion)
+                for key in keys
+            )
+        pairs.sort()
+        self.keys = [pair[0] for pair in pairs]
+        self.suggestions = [pair[3] for pair in pairs]
+
+    @staticmethod
+    def _normalize(keys):
+        return sorted({key.lower() for key in keys if key})
+
+    def add(self, suggestion, keys):
+        self.remove(suggestion.kind, suggestion.pk)
+        keys = self._normalize(keys)
+        for key in keys:
+            position = bisect.bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.suggestions.insert(position, suggestion)
+        self.objects[suggestion.kind, suggestion.pk] = keys
+
+    def remove(self, kind, pk):
+        for key in self.objects.pop((kind, pk), ()):
+            position = bisect.bisect_left(self.keys, key)
+            while (position < len(self.keys)
+                   and self.keys[position] == key):
+                if self.suggestions[position][:2] == (kind, pk):
+                    del self.keys[position]
+                    del self.suggestions[position]
+                    break
+                position += 1
+
+    def search(self, prefix, limit=LIMIT, deadline=None):
+        """Возвращает (подсказки, полный ли ответ)."""
+        prefix = prefix.lower()
+        found = {}
+        position = bisect.bisect_left(self.keys, prefix)
+        while (position < len(self.keys)
+               and self.keys[position].startswith(prefix)):
+            suggestion = self.suggestions[position]
+            found.setdefault(suggestion[:2], suggestion)
+            if len(found) >= limit:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                return list(found.values()), False
+            position += 1
+        return list(found.values()), True
+
+
+def user_suggestion(user):
+    full_name = user.get_full_name()
+    return Suggestion(
+        USER, user.pk, user.username,
+        f'{full_name} ({user.username})' if full_name else user.username,
+    ), (
+        user.username, user.first_name, user.last_name, full_name,
+    )
+
+
+def group_suggestion(group):
+    return Suggestion(GROUP, group.pk, group.slug, group.title), (
+        group.slug, group.title, *group.title.split(),
+    )
+
+
+def build():
+    users = User.objects.filter(is_active=True).only(
+        'username', 'first_name', 'last_name'
+    )
+    groups = Group.objects.only('slug', 'title')
+    return PrefixIndex([
+        *(user_suggestion(user) for user in users.iterator()),
+        *(group_suggestion(group) for group in groups.iterator()),
+    ])
+
+
+def apply(index, change):
+    """Применяет изменение ('add', объект, ключи) или ('remove', вид, pk)."""
+    action, *args = change
+    if action == 'add':
+        index.add(*args)
+    else:
+        index.remove(*args)
+
+
+_index = None
+_version = None
+_lock = threading.RLock()
+_rebuilding = False
+
+
+def _current_version():
+    return cache_versions.get_versions([VERSION])[VERSION]
+
+
+def _rebuild(version):
+    global _index, _version, _rebuilding
+    try:
+        index = build()
+        with _lock:
+            _index, _version = index, version
+    finally:
+        _rebuilding = False
+
+
+def _rebuild_in_background(version):
+    try:
+        _rebuild(version)
+    finally:
+        # У потока своё соединение с базой, и его никто больше не закроет.
+        connections.close_all()
+
+
+def _catch_up(version):
+    """Применяет изменения других процессов; False — нужна пересборка."""
+    global _version
+    if _version is None or not 0 < version - _version <= MAX_CHANGES:
+        return False
+    keys = [CHANGE_KEY.format(number)
+            for number in range(_version + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    for key in keys:
+        apply(_index, changes[key])
+    _version = version
+    return True
+
+
+def get_index():
+    """Индекс процесса или None, пока первая сборка не закончилась.
+
+    Отставший индекс догоняет изменения или пересобирается в фоне.
+    """
+    global _rebuilding
+    version = _current_version()
+    with _lock:
+        if _version != version and not _rebuilding and (
+            _index is None or not _catch_up(version)
+        ):
+            _rebuilding = True
+            threading.Thread(
+                target=_rebuild_in_background, args=(version,), daemon=True
+            ).start()
+        return _index
+
+
+def suggest(prefix, limit=LIMIT, budget=BUDGET):
+    """Подсказки по префиксу: ([{type, label, url}], полный ли ответ)."""
+    deadline = time.monotonic() + budget
+    prefix = prefix.strip()
+    if not prefix:
+        return [], True
+    index = get_index()
+    if index is None:
+        return [], False
+    suggestions, complete = index.search(prefix, limit, deadline)
+    return [
+        {
+            'type': suggestion.kind,
+            'label': suggestion.label,
+            'url': _url(suggestion),
+        }
+        for suggestion in suggestions
+    ], complete
+
+
+def _url(suggestion):
+    if suggestion.kind == USER:
+        return reverse('posts:profile', args=(suggestion.name,))
+    return reverse('posts:group_list', args=(suggestion.name,))
+
+
+def _changed(change):
+    # Изменение видно этому процессу сразу, остальным — когда они
+    # заметят новую версию и прочитают его из кеша. Повторное
+    # применение ничего не портит: add сначала удаляет старые ключи.
+    global _version
+    with _lock:
+        if _index is not None:
+            apply(_index, change)
+    version = cache_versions.bump(*VERSION)
+    cache.set(CHANGE_KEY.format(version), change, CHANGE_TIMEOUT)
+    with _lock:
+        if _index is not None and _version == version - 1:
+            _version = version
+
+
+def update_user(user):
+    if not user.is_active:
+        remove_user(user.pk)
+        return
+    _changed(('add', *user_suggestion(user)))
+
+
+def remove_user(pk):
+    _changed(('remove', USER, pk))
+
+
+def update_group(group):
+    _changed(('add', *group_suggestion(group)))
+
+
+def remove_group(pk):
+    _changed(('remove', GROUP, pk))
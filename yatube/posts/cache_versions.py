@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+
+KEY = 'cache_version:{}:{}'
+
+
+def _fresh():
+    # Новое значение всегда больше прежних, даже если ключ версии
+    # вытеснили из кеша: старый фрагмент не совпадёт с новым ключом.
+    return time.time_ns()
+
+
+def bump(kind, pk):
+    """Увеличивает версию и возвращает новое значение."""
+    key = KEY.format(kind, pk)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh()
+        cache.set(key, version, None)
+        return version
+
+
+def get_versions(pairs):
+    """Возвращает словарь {(kind, pk): версия} одним запросом к кешу."""
+    keys = {KEY.format(kind, pk): (kind, pk) for kind, pk in pairs}
+    found = cache.get_many(keys)
+    missing = {key: _fresh() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def page_version(posts):
+    """Ключ фрагмента, который меняется только вместе с содержимым страницы.
+
+    Учитывает состав и порядок постов, а также версии самих постов,
+    их авторов и групп.
+    """
+    posts = list(posts)
+    pairs = set()
+    for post in posts:
+        pairs.add(('post', post.pk))
+        pairs.add(('user', post.author_id))
+        if post.group_id is not None:
+            pairs.add(('group', post.group_id))
+    versions = get_versions(pairs)
+    parts = []
+    for post in posts:
+        parts.append(
+            f"{post.pk}.{versions['post', post.pk]}"
+            f".{versions['user', post.author_id]}"
+            f".{versions.get(('group', post.group_id), 0)}"
+        )
+    return '-'.join(parts)
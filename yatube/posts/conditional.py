@@ -0,0 +1,172 @@
+"""Валидаторы условных GET-запросов (ETag / Last-Modified).
+
+Каждое представление получает пару дешёвых функций для
+django.views.decorators.http.condition. Обе функции считают одно и то же
+состояние страницы, поэтому оно вычисляется один раз за запрос. Если
+клиент прислал совпадающий If-None-Match, ответ 304 отдаётся без
+полного запроса ленты и без рендеринга шаблона. Ленты отдают только
+ETag, Last-Modified есть лишь у страницы поста.
+"""
+import hashlib
+
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from . import suggestions
+from .cache_versions import get_versions, page_version
+from .models import Comment, Follow, Group, Post, User
+from .paginators import LIMIT_OF_POSTS, pagination
+from .tags import TagPaginator
+from .timeline import TimelinePaginator
+
+# Поля поста, от которых зависит его вид в ленте.
+FEED_FIELDS = ('pub_date', 'author', 'group')
+
+
+def page_condition(state_func, csrf=False):
+    """Декоратор condition() поверх state_func(request, *args, **kwargs).
+
+    state_func возвращает (части ETag, Last-Modified) или None, если
+    валидаторов нет (например, страница не найдена).
+
+    csrf=True — страница показывает вошедшему пользователю форму с
+    {% csrf_token %}. Тогда в ETag входит секрет CSRF: после повторного
+    входа Django меняет его, и 304 оставил бы в браузере форму со
+    старым токеном.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_page_state'):
+            result = state_func(request, *args, **kwargs)
+            if result is not None:
+                parts, last_modified = result
+                parts = (
+                    request.path,
+                    request.GET.urlencode(),
+                    request.user.pk,
+                    _csrf_secret(request) if csrf else None,
+                    *parts,
+                )
+                etag = hashlib.md5(
+                    '|'.join(map(str, parts)).encode()
+                ).hexdigest()
+                result = etag, last_modified
+            request._page_state = result
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        result = state(request, *args, **kwargs)
+        return result and result[0]
+
+    def last_modified(request, *args, **kwargs):
+        result = state(request, *args, **kwargs)
+        return result and result[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _csrf_secret(request):
+    if not request.user.is_authenticated:
+        return None
+    # get_token() заводит секрет, если его ещё нет, и тот же секрет
+    # попадёт в форму при рендеринге и в cookie ответа, даже ответа 304.
+    get_token(request)
+    return request.META.get('CSRF_COOKIE')
+
+
+def feed_state(request, post_list, cursor_paginator=None, parts=()):
+    """Состояние страницы ленты по лёгкой выборке тех же постов."""
+    page_obj = pagination(
+        request,
+        post_list.select_related(None).only(*FEED_FIELDS),
+        cursor_paginator
+    )
+    # Last-Modified у ленты нет: самая свежая правка на странице уходит
+    # назад после удаления поста и не отражает parts.
+    return (page_version(list(page_obj)), *parts), None
+
+
+def index_state(request):
+    return feed_state(request, Post.objects.all())
+
+
+def group_state(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return None
+    return feed_state(
+        request,
+        group.posts.all(),
+        parts=(group.title, group.description, group.posts_count),
+    )
+
+
+def profile_state(request, username):
+    author = User.objects.filter(
+        username=username
+    ).select_related('counters').first()
+    if author is None:
+        return None
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
+    counters = getattr(author, 'counters', None)
+    return feed_state(
+        request,
+        Post.objects.filter(author=author),
+        parts=(
+            following,
+            suggestions.version(request.user),
+            counters and counters.posts_count,
+            counters and counters.followers_count,
+            counters and counters.following_count,
+        ),
+    )
+
+
+def follow_state(request):
+    return feed_state(
+        request,
+        Post.objects.filter(author__following__user=request.user),
+        TimelinePaginator(
+            request.user, LIMIT_OF_POSTS, post_fields=FEED_FIELDS
+        ),
+        parts=(suggestions.version(request.user),),
+    )
+
+
+def tag_state(request, name):
+    tag = name.lower()
+    return feed_state(
+        request,
+        Post.objects.filter(tags__tag=tag),
+        TagPaginator(tag, LIMIT_OF_POSTS, post_fields=FEED_FIELDS),
+    )
+
+
+def post_detail_state(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'updated_at', 'comments_count', 'author', 'group',
+        'author__counters__posts_count',
+    ).first()
+    if post is None:
+        return None
+    latest_comment = Comment.objects.filter(
+        post=post_id
+    ).values_list('pk', 'created').first()
+    pairs = [('post', post_id), ('user', post['author'])]
+    if post['group'] is not None:
+        pairs.append(('group', post['group']))
+    versions = get_versions(pairs)
+    last_modified = post['updated_at']
+    if latest_comment and latest_comment[1] > last_modified:
+        last_modified = latest_comment[1]
+    return (
+        (
+            post['updated_at'].isoformat(),
+            post['comments_count'],
+            post['author__counters__posts_count'],
+            latest_comment,
+            sorted(versions.values()),
+        ),
+        last_modified,
+    )
@@ -0,0 +1,112 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from .timeline import mark_celebrities
+
+
+def bump(queryset, field, delta):
+    """Атомарно сдвигает счётчик одним UPDATE ... SET field = field + delta.
+
+    Счётчик не уходит ниже нуля: такие строки не обновляются и будут
+    исправлены командой recount_counters. Возвращает число обновлённых
+    строк.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if bump(counters, field, delta) or delta < 0:
+        return
+    # Строки счётчиков ещё нет (пользователь создан до её появления).
+    UserCounters.objects.get_or_create(user_id=user_id)
+    bump(counters, field, delta)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_post(post_id, delta):
+    bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount(batch_size=1000):
+    """Пересчитывает все счётчики по фактическим данным.
+
+    Обходит таблицы пачками по первичному ключу и обновляет только
+    разошедшиеся строки. Возвращает число исправленных строк.
+    """
+    fixed = 0
+    for user_ids in _batches(User.objects.all(), batch_size):
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=pk) for pk in user_ids],
+            ignore_conflicts=True,
+        )
+        rows = UserCounters.objects.filter(user_id__in=user_ids).annotate(
+            real_posts=_count(Post, 'author'),
+            real_followers=_count(Follow, 'author'),
+            real_following=_count(Follow, 'user'),
+        )
+        for row in rows:
+            if (row.posts_count, row.followers_count, row.following_count) != (
+                row.real_posts, row.real_followers, row.real_following
+            ):
+                row.posts_count = row.real_posts
+                row.followers_count = row.real_followers
+                row.following_count = row.real_following
+                row.save()
+                fixed += 1
+        mark_celebrities(user_ids)
+    for group_ids in _batches(Group.objects.all(), batch_size):
+        groups = Group.objects.filter(pk__in=group_ids).annotate(
+            real_posts=_count(Post, 'group')
+        )
+        for group in groups:
+            if group.posts_count != group.real_posts:
+                Group.objects.filter(pk=group.pk).update(
+                    posts_count=group.real_posts
+                )
+                fixed += 1
+    for post_ids in _batches(Post.objects.all(), batch_size):
+        posts = Post.objects.filter(pk__in=post_ids).annotate(
+            real_comments=_count(Comment, 'post')
+        ).values_list('pk', 'comments_count', 'real_comments')
+        for pk, comments_count, real_comments in posts:
+            if comments_count != real_comments:
+                Post.objects.filter(pk=pk).update(
+                    comments_count=real_comments
+                )
+                fixed += 1
+    return fixed
+
+
+def _batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
@@ -1,6 +1,11 @@
 from django import forms
+from django.conf import settings
+
+from core.uploadhandlers import validate_upload_size
 from .models import Post, Comment
 
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
 
 class PostForm(forms.ModelForm):
     class Meta:
@@ -25,8 +30,40 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def clean_image(self):
+        # ImageField уже прочитал только заголовок картинки (Image.open
+        # без load()), поэтому размеры проверяются до декодирования.
+        image = self.cleaned_data['image']
+        header = getattr(image, 'image', None)
+        if header is None:
+            return image
+        # Тот же валидатор стоит на поле модели; здесь он идёт первым,
+        # чтобы о размере сообщить раньше ошибок формата.
+        validate_upload_size(image)
+        if header.format not in ALLOWED_IMAGE_FORMATS:
+            raise forms.ValidationError(
+                'Поддерживаются только JPEG, PNG, GIF и WebP.'
+            )
+        width, height = header.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                f'Картинка {width}×{height} слишком большая.'
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        label='Поиск',
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    author = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    group = forms.IntegerField(required=False, widget=forms.HiddenInput)
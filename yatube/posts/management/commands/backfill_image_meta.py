@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import cache_versions
+from posts.models import Post
+from posts.thumbnails import image_storage, measure
+
+
+def try_measure(path):
+    if path is None:
+        return None
+    try:
+        return measure(path)
+    except (OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и основной цвет картинок у постов, '
+        'загруженных до появления этих полей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов читать за один запрос',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Сколько процессов читают картинки; 0 — без пула',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            Q(image_width__isnull=True) | Q(image_color='')
+        )
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        self.updated = self.failed = 0
+        last_pk = 0
+        try:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', 'image')[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                self.process({name for _, name in batch}, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {self.updated}, ошибок: {self.failed}'
+        ))
+
+    def process(self, names, pool):
+        # Воркерам передаются пути, а в базу пишет только этот процесс.
+        storage = image_storage()
+        paths = {}
+        for name in names:
+            try:
+                paths[name] = storage.path(name)
+            except SuspiciousFileOperation:
+                paths[name] = None
+        mapper = map if pool is None else pool.map
+        for name, result in zip(paths, mapper(try_measure, paths.values())):
+            if result is None:
+                self.failed += 1
+                self.stderr.write(f'Не удалось прочитать {name}')
+                continue
+            width, height, color = result
+            changed = Post.objects.filter(image=name)
+            pks = list(changed.values_list('pk', flat=True))
+            self.updated += changed.update(
+                image_width=width,
+                image_height=height,
+                image_color=color,
+            )
+            for pk in pks:
+                cache_versions.bump('post', pk)
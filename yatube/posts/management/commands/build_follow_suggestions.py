@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает подсказки «кого почитать» по друзьям друзей и '
+        'совместным подпискам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=suggestions.TOP_N,
+            help='Сколько подсказок хранить для каждого пользователя',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=suggestions.CHUNK_SIZE,
+            help='Сколько пользователей обрабатывать за раз',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=suggestions.BATCH_SIZE,
+            help='Сколько подписок читать из базы за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = suggestions.build(
+            top_n=options['top_n'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано пользователей: {users} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
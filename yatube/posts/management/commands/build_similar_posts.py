@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает похожие посты по TF-IDF. С --incremental добавляет '
+        'только новые посты к сохранённой модели'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Обработать только посты новее сохранённой модели',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=similar.TOP_K,
+            help='Сколько похожих постов хранить для каждого поста',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=similar.CHUNK_SIZE,
+            help='Сколько строк матрицы сравнивать со всеми за раз',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=similar.BATCH_SIZE,
+            help='Сколько постов читать из базы за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        run = similar.update if options['incremental'] else similar.build
+        processed = run(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {processed} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
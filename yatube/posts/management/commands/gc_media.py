@@ -0,0 +1,52 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.media import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и миниатюры, на которые не ссылается '
+        'ни один пост. Прерванный запуск продолжается с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько файлов сверять с базой за один запрос',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе этого числа секунд',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'gc_media.checkpoint'),
+            help=(
+                'Файл, в котором запоминается место остановки; '
+                'с --dry-run не читается и не пишется'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать файлы, ничего не удаляя',
+        )
+
+    def handle(self, *args, **options):
+        scanned, deleted = collect_garbage(
+            batch_size=options['batch_size'],
+            min_age=options['min_age'],
+            dry_run=options['dry_run'],
+            checkpoint=options['checkpoint'],
+        )
+        verb = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}. {verb}: {deleted}'
+        ))
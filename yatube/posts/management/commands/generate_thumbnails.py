@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate, pending
+
+
+def regenerate(post_pk, source_name):
+    """Готовит файлы одной картинки; возвращает текст ошибки или None."""
+    try:
+        generate(post_pk, source_name)
+    except Exception as error:
+        return f'{type(error).__name__}: {error}'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры и варианты картинок постов в пуле процессов. '
+        'Прерванный запуск продолжается с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Переделать и готовые файлы, например после смены размеров',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько картинок читать из базы и обрабатывать за раз',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Сколько процессов готовят миниатюры; 0 — без пула',
+        )
+        parser.add_argument(
+            '--max-rate',
+            type=float,
+            default=0,
+            help='Не больше стольких картинок в секунду; 0 — без ограничения',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Файл, в котором запоминается место остановки; по '
+                'умолчанию свой в BASE_DIR для запусков с --all и без'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        checkpoint = options['checkpoint'] or os.path.join(
+            settings.BASE_DIR,
+            'generate_thumbnails.{}.checkpoint'.format(
+                'all' if options['all'] else 'missing'
+            ),
+        )
+        self.processed = self.failed = 0
+        self.started = time.monotonic()
+        try:
+            for last_name, batch in self.batches(
+                self.load_checkpoint(checkpoint), options['batch_size']
+            ):
+                if not options['all']:
+                    missing = pending(batch)
+                    batch = {
+                        name: pk for name, pk in batch.items()
+                        if name in missing
+                    }
+                self.process(batch, pool)
+                self.throttle(options['max_rate'])
+                self.save_checkpoint(checkpoint, last_name)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлено картинок: {self.processed - self.failed}, '
+            f'ошибок: {self.failed}, {self.rate():.1f} изобр./с'
+        ))
+
+    def batches(self, after, batch_size):
+        """Пачки {имя оригинала: pk одного из постов} в порядке имён.
+
+        Одинаковые картинки хранятся одним файлом, поэтому каждое имя
+        обрабатывается один раз. Чтение идёт по индексу post_image_idx.
+        Вместе с пачкой возвращается её последнее имя: с него
+        продолжится прерванный запуск.
+        """
+        posts = Post.objects.exclude(image='').order_by('image', 'pk')
+        while True:
+            rows = posts
+            if after:
+                rows = rows.filter(image__gt=after)
+            batch = {}
+            for name, pk in rows.values_list('image', 'pk')[:batch_size]:
+                batch.setdefault(name, pk)
+            if not batch:
+                return
+            after = max(batch)
+            yield after, batch
+
+    def process(self, batch, pool):
+        mapper = map if pool is None else pool.map
+        errors = mapper(regenerate, batch.values(), batch.keys())
+        for name, error in zip(batch, errors):
+            self.processed += 1
+            if error is not None:
+                self.failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(
+            f'Обработано картинок: {self.processed}, '
+            f'{self.rate():.1f} изобр./с'
+        )
+
+    def throttle(self, max_rate):
+        # Пауза после пачки держит среднюю скорость не выше max_rate,
+        # чтобы не забирать весь диск у работающего сайта.
+        if max_rate <= 0:
+            return
+        ahead = self.processed / max_rate - self.elapsed()
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed else 0.0
+
+    def load_checkpoint(self, checkpoint):
+        if not os.path.exists(checkpoint):
+            return None
+        with open(checkpoint) as saved:
+            return saved.read().strip() or None
+
+    def save_checkpoint(self, checkpoint, name):
+        with open(checkpoint, 'w') as saved:
+            saved.write(name)
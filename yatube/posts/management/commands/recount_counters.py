@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с фактическими данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк обрабатывать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        fixed = recount(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {fixed}')
+        )
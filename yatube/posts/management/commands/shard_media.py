@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import reshard
+from posts.models import MediaFile
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов и их миниатюры из плоских каталогов '
+        'в шардированные по хешу содержимого'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько имён файлов читать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        last = ''
+        # Keyset по имени: перенесённые файлы получают новые имена, но
+        # уже пройденные строки повторно не читаются.
+        while True:
+            names = list(MediaFile.objects.filter(
+                name__gt=last
+            ).order_by('name').values_list(
+                'name', flat=True
+            )[:options['batch_size']])
+            if not names:
+                break
+            last = names[-1]
+            for name in names:
+                new_name = reshard(name)
+                if new_name is None:
+                    missing += 1
+                elif new_name != name:
+                    moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}'
+        ))
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import global_settings, settings
+from django.core.files.uploadhandler import StopFutureHandlers, load_handler
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+CHUNK_SIZE = 64 * 1024
+
+
+def receive(handler_paths, path):
+    """Прогоняет файл через цепочку обработчиков, как MultiPartParser."""
+    handlers = [load_handler(handler_path) for handler_path in handler_paths]
+    size = os.path.getsize(path)
+    for handler in handlers:
+        handler.handle_raw_input(None, {}, size, 'benchmark', 'utf-8')
+    for handler in handlers:
+        try:
+            handler.new_file('image', 'image.jpg', 'image/jpeg', size)
+        except StopFutureHandlers:
+            break
+    with open(path, 'rb') as source:
+        start = 0
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            length = len(chunk)
+            for handler in handlers:
+                chunk = handler.receive_data_chunk(chunk, start)
+                if chunk is None:
+                    break
+            start += length
+    for handler in handlers:
+        upload = handler.file_complete(size)
+        if upload is not None:
+            return upload
+
+
+def default_handlers(path):
+    """Прежний путь: обработчики Django по умолчанию и forms.ImageField."""
+    from django import forms
+
+    upload = receive(global_settings.FILE_UPLOAD_HANDLERS, path)
+    forms.ImageField().clean(upload)
+    upload.close()
+
+
+def bounded_handler(path):
+    """Новый путь: ограниченный обработчик и проверки PostForm."""
+    from posts.forms import PostForm
+
+    upload = receive(settings.FILE_UPLOAD_HANDLERS, path)
+    form = PostForm({'text': 'benchmark'}, {'image': upload})
+    if not form.is_valid():
+        raise ValueError(form.errors.as_text())
+    upload.close()
+
+
+SCENARIOS = {
+    'default': default_handlers,
+    'bounded': bounded_handler,
+}
+
+
+def memory_status(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def peak_growth(scenario, path):
+    """Насколько вырос пиковый RSS процесса за время сценария, КиБ."""
+    # ru_maxrss переживает execve и достаётся дочернему процессу от
+    # родителя, поэтому пик сбрасывается через clear_refs (Linux).
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    baseline = memory_status('VmRSS')
+    SCENARIOS[scenario](path)
+    return memory_status('VmHWM') - baseline
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковую память на одну загрузку картинки: обработчики '
+        'Django по умолчанию и ограниченный обработчик с проверками PostForm'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--width', type=int, default=6000, help='Ширина картинки'
+        )
+        parser.add_argument(
+            '--height', type=int, default=4000, help='Высота картинки'
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'image.jpg')
+        size = (options['width'], options['height'])
+        gradient = Image.linear_gradient('L').resize(size)
+        Image.merge(
+            'RGB', (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT),
+                    gradient.transpose(Image.FLIP_TOP_BOTTOM))
+        ).save(path, 'JPEG', quality=90)
+        try:
+            self.stdout.write(
+                f'Картинка {size[0]}×{size[1]}, '
+                f'{os.path.getsize(path) // 1024} КиБ'
+            )
+            self.stdout.write(f'{"scenario":<10} {"peak RSS, KiB":>14}')
+            for scenario in SCENARIOS:
+                # Каждый сценарий в свежем процессе, чтобы пики не
+                # накладывались друг на друга.
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                ) as pool:
+                    growth = pool.submit(peak_growth, scenario, path).result()
+                self.stdout.write(f'{scenario:<10} {growth:>14}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
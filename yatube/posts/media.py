@@ -0,0 +1,268 @@
+"""Счётчики ссылок на файлы картинок постов.
+
+Одинаковые картинки хранятся одним файлом (ContentAddressedStorage),
+поэтому удалить файл можно, только когда на него не ссылается ни один
+пост. Счётчики сдвигаются в той же транзакции, что и изменение поста,
+а файлы удаляются после её фиксации.
+
+Здесь же перенос старых файлов в шардированные каталоги (reshard) и
+сборка осиротевших файлов (collect_garbage).
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import cache_versions, thumbnails
+from .models import MediaFile, Post
+from .storage import is_sharded
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name, count=1):
+    """Добавляет ссылки на файл и возвращает новое число ссылок."""
+    files = MediaFile.objects.filter(name=name)
+    if not files.update(refcount=F('refcount') + count):
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, refcount=count)
+            return count
+        except IntegrityError:
+            files.update(refcount=F('refcount') + count)
+    return files.values_list('refcount', flat=True).get()
+
+
+def release(name):
+    """Убирает ссылку на файл; последняя ссылка удаляет файл."""
+    files = MediaFile.objects.filter(name=name)
+    files.update(refcount=F('refcount') - 1)
+    deleted, _ = files.filter(refcount__lte=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_files(name))
+
+
+def delete_files(name):
+    """Удаляет оригинал и все производные файлы, если ссылок нет."""
+    # За время транзакции файл могли загрузить заново.
+    if MediaFile.objects.filter(name=name).exists():
+        return
+    # Ошибка уборки файлов не должна ронять уже выполненный запрос.
+    try:
+        thumbnails.image_storage().delete(name)
+        for derived in thumbnails.stored_derived_names(name):
+            default_storage.delete(derived)
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось удалить файлы %s', name, exc_info=True)
+
+
+def copy_variants(post_pk, name):
+    """Берёт готовые варианты у другого поста с той же картинкой.
+
+    Возвращает False, если их ещё нет и картинку нужно обработать.
+    """
+    fields = ('image_variants', 'image_color', 'image_width', 'image_height')
+    processed = Post.objects.filter(image=name).exclude(
+        pk=post_pk
+    ).exclude(image_variants='').values(*fields).first()
+    if processed is None:
+        return False
+    Post.objects.filter(pk=post_pk).update(**processed)
+    return True
+
+
+def _legacy_derived_names(source_name):
+    # Раскладка миниатюр до шардирования: по md5 имени оригинала.
+    digest = hashlib.md5(source_name.encode()).hexdigest()
+    names = [
+        f'thumbnails/{geometry}/{digest[:2]}/{digest}.jpg'
+        for geometry in thumbnails.GEOMETRIES
+    ]
+    for _, image_format, _ in thumbnails.VARIANT_FORMATS:
+        for width in thumbnails.VARIANT_WIDTHS:
+            names.append(
+                f'thumbnails/variants/{digest[:2]}/{digest}-{width}.'
+                f'{image_format.lower()}'
+            )
+    return names
+
+
+def _move(storage, source, target):
+    if not storage.exists(source) or storage.exists(target):
+        return
+    os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+    os.replace(storage.path(source), storage.path(target))
+
+
+def reshard(name):
+    """Переносит оригинал и его производные в шардированные каталоги.
+
+    Возвращает новое имя или None, если файла нет. Посты и счётчики
+    ссылок переводятся на новое имя в одной транзакции, старый оригинал
+    удаляется после её фиксации.
+    """
+    if is_sharded(name):
+        return name
+    storage = thumbnails.image_storage()
+    if not storage.exists(name):
+        logger.warning('Файл %s не найден', name)
+        return None
+    with storage.open(name) as content:
+        new_name = storage.hashed_name(name, content)
+        if not storage.exists(new_name):
+            storage.replace(new_name, content)
+    renames = {}
+    new_derived = thumbnails.derived_names(new_name)
+    for old_derived in (
+        _legacy_derived_names(name), thumbnails.derived_names(name)
+    ):
+        for source, target in zip(old_derived, new_derived):
+            _move(default_storage, source, target)
+            renames[source] = target
+    posts = Post.objects.filter(image=name)
+    with transaction.atomic():
+        variants = posts.exclude(image_variants='').values_list(
+            'image_variants', flat=True
+        ).first()
+        changes = {'image': new_name}
+        if variants:
+            changes['image_variants'] = json.dumps({
+                mime_type: [
+                    [renames.get(variant, variant), width, height]
+                    for variant, width, height in entries
+                ]
+                for mime_type, entries in json.loads(variants).items()
+            })
+        pks = list(posts.values_list('pk', flat=True))
+        posts.update(**changes)
+        refcount = MediaFile.objects.filter(name=name).values_list(
+            'refcount', flat=True
+        ).first()
+        MediaFile.objects.filter(name=name).delete()
+        if refcount:
+            acquire(new_name, refcount)
+        for pk in pks:
+            cache_versions.bump('post', pk)
+        transaction.on_commit(lambda: delete_files(name))
+    return new_name
+
+
+def walk(storage, root, after=None):
+    """Имена файлов под root в лексикографическом порядке путей.
+
+    after — имя, после которого продолжить; поддеревья целиком до него
+    пропускаются без чтения.
+    """
+    after = tuple(after.split('/')) if after else ()
+
+    def scan(directory):
+        parts = tuple(directory.split('/'))
+        try:
+            entries = sorted(os.scandir(storage.path(directory)),
+                             key=lambda entry: entry.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            path = (*parts, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                # Каталог целиком раньше точки продолжения.
+                if path < after[:len(path)]:
+                    continue
+                yield from scan('/'.join(path))
+            elif path > after:
+                yield '/'.join(path), entry.stat().st_mtime
+
+    yield from scan(root)
+
+
+def referenced(names):
+    """Какие из имён оригиналов ещё нужны постам."""
+    names = set(names)
+    found = set(MediaFile.objects.filter(
+        name__in=names
+    ).values_list('name', flat=True))
+    # MediaFile сверяется с самими постами: файл без счётчика, но с
+    # постом удалять нельзя.
+    found.update(Post.objects.filter(
+        image__in=names - found
+    ).values_list('image', flat=True))
+    return found
+
+
+def is_served(name):
+    """Относится ли файл к картинке, на которую ссылается пост."""
+    source = thumbnails.source_of(name) or name
+    upload_root = Post._meta.get_field('image').upload_to.strip('/')
+    if not source.startswith(f'{upload_root}/'):
+        return False
+    return bool(referenced([source]))
+
+
+def collect_garbage(batch_size=1000, min_age=60 * 60, dry_run=False,
+                    checkpoint=None):
+    """Удаляет оригиналы и производные файлы, на которые нет ссылок.
+
+    Файлы читаются с диска пачками по batch_size и сверяются с базой
+    запросами по индексам, поэтому ни список файлов, ни список постов
+    целиком в память не попадает. Файлы моложе min_age секунд не
+    трогаются: их пост мог ещё не зафиксироваться. После каждой пачки
+    последнее имя записывается в файл checkpoint, и повторный запуск
+    продолжает с него; пробный запуск dry_run всегда проходит всё
+    хранилище и файл не трогает. Возвращает (проверено, удалено).
+    """
+    if dry_run:
+        checkpoint = None
+    storage = thumbnails.image_storage()
+    upload_root = Post._meta.get_field('image').upload_to.strip('/')
+    after = None
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as saved:
+            after = saved.read().strip() or None
+    scanned = deleted = 0
+    deadline = time.time() - min_age
+    for root in (upload_root, thumbnails.DERIVED_ROOT):
+        if after and after.split('/')[0] > root:
+            continue
+        batch = []
+        for name, modified in walk(storage, root, after):
+            batch.append((name, modified))
+            if len(batch) >= batch_size:
+                deleted += _collect_batch(storage, batch, deadline, dry_run)
+                scanned += len(batch)
+                _save_checkpoint(checkpoint, batch[-1][0])
+                batch = []
+        if batch:
+            deleted += _collect_batch(storage, batch, deadline, dry_run)
+            scanned += len(batch)
+            _save_checkpoint(checkpoint, batch[-1][0])
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return scanned, deleted
+
+
+def _collect_batch(storage, batch, deadline, dry_run):
+    sources = {}
+    for name, _ in batch:
+        source = thumbnails.source_of(name)
+        sources[name] = name if source is None else source
+    alive = referenced(sources.values())
+    deleted = 0
+    for name, modified in batch:
+        if sources[name] in alive or modified > deadline:
+            continue
+        deleted += 1
+        if not dry_run:
+            storage.delete(name)
+    return deleted
+
+
+def _save_checkpoint(checkpoint, name):
+    if checkpoint:
+        with open(checkpoint, 'w') as saved:
+            saved.write(name)
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON со списком вариантов картинки для srcset', verbose_name='Варианты картинки'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:57
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+HASHTAG = re.compile(r'(?<![\w&#])#(\w{1,50})(?!\w)')
+
+
+def extract_tags(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    posts = Post.objects.filter(text__contains='#').values_list(
+        'pk', 'text', 'pub_date'
+    )
+    PostTag.objects.bulk_create(
+        (
+            PostTag(tag=tag, post_id=pk, pub_date=pub_date)
+            for pk, text, pub_date in posts.iterator()
+            for tag in list(dict.fromkeys(
+                match.group(1).lower() for match in HASHTAG.finditer(text)
+            ))[:20]
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50, verbose_name='Тег')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Тег поста',
+                'verbose_name_plural': 'Теги постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='post_tag_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(extract_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.28 on 2026-10-18 05:16
+
+import core.uploadhandlers
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, height_field='image_height', storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', validators=[core.uploadhandlers.validate_upload_size], verbose_name='Картинка', width_field='image_width'),
+        ),
+    ]
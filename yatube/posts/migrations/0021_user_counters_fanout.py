@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+# timeline.FANOUT_LIMIT на момент миграции.
+FANOUT_LIMIT = 1000
+
+
+def mark_celebrities(apps, schema_editor):
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.filter(
+        followers_count__gt=FANOUT_LIMIT
+    ).update(fanout=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_image_size_validator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='fanout',
+            field=models.BooleanField(default=True, verbose_name='Посты раскладываются по лентам'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models.signals import post_init
 from django.contrib.auth import get_user_model
 from django.db.models.fields import CharField, SlugField, TextField
 
+from core.uploadhandlers import validate_upload_size
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -15,6 +19,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -33,22 +41,85 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        width_field='image_width',
+        height_field='image_height',
+        blank=True,
+        validators=[validate_upload_size],
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False,
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON со списком вариантов картинки для srcset',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
     )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            # Поиск постов по файлу: перенос в шарды и сборка мусора.
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+# ImageField с width_field открывает файл при каждой загрузке поста из
+# базы, если размеры ещё не заполнены. Размеры заполняются при загрузке
+# картинки (см. signals.fill_image_dimensions) и командой
+# backfill_image_meta, поэтому страницы файлы не открывают.
+post_init.disconnect(
+    Post._meta.get_field('image').update_dimension_fields, sender=Post
+)
+
+
 class Group(models.Model):
     title = CharField(max_length=200)
     slug = SlugField(unique=True)
     description = TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
@@ -78,6 +149,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -94,3 +171,193 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+
+
+class MediaFile(models.Model):
+    """Число постов, которые ссылаются на файл картинки."""
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0,
+    )
+    fanout = models.BooleanField(
+        'Посты раскладываются по лентам',
+        default=True,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    /follow/ читается одним диапазоном по индексу (user, pub_date, post).
+    pub_date скопирована из поста, чтобы не делать join при сортировке.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class PostTag(models.Model):
+    """Хештег поста.
+
+    Теги извлекаются из текста при сохранении поста, поэтому лента
+    /tag/<имя>/ читается одним диапазоном по индексу (tag, pub_date,
+    post), без поиска по тексту. pub_date скопирована из поста.
+    """
+    tag = models.CharField('Тег', max_length=50)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tags',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='unique_post_tag',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='post_tag_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'#{self.tag}'
+
+
+class SimilarPost(models.Model):
+    """Похожий пост для блока на странице поста.
+
+    Заполняется командой build_similar_posts (см. posts/similar.py).
+    rank — место в списке, 0 у самого похожего; уникальность (post, rank)
+    даёт индекс, по которому страница поста читает список одним запросом.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='similar_posts',
+        verbose_name='Пост',
+    )
+    similar = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий пост',
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Близость')
+
+    class Meta:
+        verbose_name = 'Похожий пост'
+        verbose_name_plural = 'Похожие посты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'rank'],
+                name='unique_similar_post_rank',
+            ),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Автор, которого стоит предложить пользователю.
+
+    Заполняется командой build_follow_suggestions (см.
+    posts/suggestions.py). rank — место в списке, 0 у лучшего;
+    уникальность (user, rank) даёт индекс, по которому страницы читают
+    список одним запросом.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+    )
+    suggested = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Предложенный автор',
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Подсказка подписки'
+        verbose_name_plural = 'Подсказки подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'rank'],
+                name='unique_follow_suggestion_rank',
+            ),
+        ]
@@ -0,0 +1,139 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+LIMIT_OF_POSTS = 10
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, post):
+    """Кодирует позицию (pub_date, id) поста в непрозрачную строку."""
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def keyset(queryset, direction, pub_date=None, pk=None,
+           date_field='pub_date', id_field='pk'):
+    """Отбирает и сортирует записи по ключу (date_field, id_field)."""
+    newer = direction == PREVIOUS
+    if pub_date is not None:
+        lookup = 'gt' if newer else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__{lookup}': pk})
+        )
+    if newer:
+        return queryset.order_by(date_field, id_field)
+    return queryset.order_by(f'-{date_field}', f'-{id_field}')
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id).
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница — это диапазонное
+    чтение от позиции курсора, поэтому глубокие страницы стоят столько же,
+    сколько первая. Равные pub_date упорядочиваются по id.
+
+    Пагинатор знает только окно вокруг текущей страницы: номер страницы
+    равен 1 или 2, а num_pages — номеру плюс один, если есть следующая.
+    Этого хватает стандартному Page, чтобы ответить на has_next() и
+    has_previous() без подсчёта записей.
+    """
+
+    cursor_mode = True
+    # Прочие параметры запроса, которые ссылки на страницы сохраняют.
+    link_params = ''
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cursor = ''
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def encode(self, direction, post):
+        return encode_cursor(direction, post)
+
+    def decode(self, cursor):
+        return decode_cursor(cursor)
+
+    def get_page(self, cursor):
+        position = self.decode(cursor)
+        if position is None:
+            return self._first_page()
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            posts = self.fetch(NEXT, pub_date, pk)
+            has_next = len(posts) > self.per_page
+            return self._build_page(
+                posts[:self.per_page], cursor, has_next, has_previous=True
+            )
+        posts = self.fetch(PREVIOUS, pub_date, pk)
+        if not posts:
+            return self._first_page()
+        has_previous = len(posts) > self.per_page
+        return self._build_page(
+            posts[:self.per_page][::-1], cursor, True, has_previous
+        )
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def fetch(self, direction, pub_date=None, pk=None):
+        """Читает per_page + 1 постов от позиции курсора.
+
+        Для NEXT посты идут от новых к старым, для PREVIOUS — наоборот.
+        """
+        return list(
+            keyset(self.object_list, direction, pub_date, pk)
+            [:self.per_page + 1]
+        )
+
+    def _first_page(self):
+        posts = self.fetch(NEXT)
+        has_next = len(posts) > self.per_page
+        return self._build_page(
+            posts[:self.per_page], '', has_next, has_previous=False
+        )
+
+    def _build_page(self, posts, cursor, has_next, has_previous):
+        self.cursor = cursor
+        if posts and has_next:
+            self.next_cursor = self.encode(NEXT, posts[-1])
+        if posts and has_previous:
+            self.previous_cursor = self.encode(PREVIOUS, posts[0])
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        return self._get_page(posts, number, self)
+
+
+def pagination(request, post_list, cursor_paginator=None):
+    if 'page' not in request.GET:
+        paginator = cursor_paginator or CursorPaginator(
+            post_list, LIMIT_OF_POSTS
+        )
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(post_list, LIMIT_OF_POSTS)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    return page_obj
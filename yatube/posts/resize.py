@@ -0,0 +1,107 @@
+"""Картинки постов произвольного размера по подписанной ссылке.
+
+Шаблон получает ссылку вида /media/resize/<подпись>/<ширина>x<высота>/
+<имя оригинала>, и файл готовится при первом запросе по ней. Результат
+сохраняется рядом с остальными производными файлами оригинала
+(thumbnails/<имя оригинала>/<ширина>x<высота>.jpg), поэтому удаляется
+вместе с ними и следующие запросы просто читают его с диска.
+
+Подпись не даёт посторонним заказывать любые размеры, а блокировка в
+кеше — готовить один и тот же файл нескольким процессам сразу. Имя
+оригинала — хеш его содержимого, и ответ можно кешировать навсегда.
+"""
+import os
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.signing import Signer
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from PIL import Image, ImageOps
+
+from .thumbnails import (
+    JPEG_QUALITY, _digest, _encode, image_storage, thumbnail_name,
+)
+
+SALT = 'posts.resize'
+MAX_SIDE = 2000
+LOCK_KEY = 'resize:{}:{}:lock'
+LOCK_TIMEOUT = 30
+WAIT = 5.0
+POLL = 0.05
+
+
+def geometry(width, height):
+    return f'{width}x{height}'
+
+
+def signature(name, width, height):
+    return Signer(salt=SALT).signature(f'{geometry(width, height)}/{name}')
+
+
+def is_valid(sign, name, width, height):
+    if not (0 < width <= MAX_SIDE and 0 < height <= MAX_SIDE):
+        return False
+    return constant_time_compare(sign, signature(name, width, height))
+
+
+def resized_url(name, width, height):
+    return reverse('posts:resize_image', kwargs={
+        'sign': signature(name, width, height),
+        'width': width,
+        'height': height,
+        'name': name,
+    })
+
+
+def resized_name(name, width, height):
+    return thumbnail_name(name, geometry(width, height))
+
+
+def ensure(name, width, height):
+    """Возвращает путь к файлу нужного размера, готовя его при надобности.
+
+    Файл готовит один процесс; остальные ждут его не дольше WAIT секунд,
+    а потом готовят сами.
+    """
+    target = resized_name(name, width, height)
+    if default_storage.exists(target):
+        return default_storage.path(target)
+    lock_key = LOCK_KEY.format(geometry(width, height), _digest(name))
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            if not default_storage.exists(target):
+                _render(name, width, height, target)
+        finally:
+            # Как в core/cache/stampede.py: запись с нулевым сроком не
+            # сдвигает эпоху двухуровневого кеша, а замок всё равно
+            # проверяется только через add в общем уровне.
+            cache.set(lock_key, 0, 0)
+        return default_storage.path(target)
+    deadline = time.time() + WAIT
+    while time.time() < deadline:
+        time.sleep(POLL)
+        if default_storage.exists(target):
+            return default_storage.path(target)
+    _render(name, width, height, target)
+    return default_storage.path(target)
+
+
+def _render(name, width, height, target):
+    with image_storage().open(name) as source:
+        image = Image.open(source)
+        image.draft('RGB', (width, height))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    resized = _encode(
+        ImageOps.fit(image, (width, height), Image.LANCZOS),
+        'JPEG',
+        quality=JPEG_QUALITY, optimize=True, progressive=True,
+    )
+    # Файл пишется под временным именем и переименовывается целиком:
+    # его отдают без блокировки и не должны увидеть наполовину записанным.
+    temporary = default_storage.save(f'{target}.{uuid.uuid4().hex}', resized)
+    os.replace(
+        default_storage.path(temporary), default_storage.path(target)
+    )
@@ -0,0 +1,203 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Таблица posts_post_fts хранит текст поста, а для фасетов — автора и
+группу; rowid совпадает с id поста. Индекс обновляется сигналами в той
+же транзакции, что и сам пост, а rebuild_search_index пересобирает его
+пачками.
+
+Каждое слово запроса ищется как префикс, и в посте должны встретиться
+все слова. Результаты упорядочены по BM25 (колонка rank, меньше —
+лучше), равные — по id. На других базах данных поиска нет, и
+is_available() возвращает False.
+"""
+import base64
+import binascii
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post, User
+from .paginators import NEXT, PREVIOUS, CursorPaginator
+
+TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+MAX_WORDS = 10
+FACET_SIZE = 10
+BATCH_SIZE = 1000
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос FTS5 из текста пользователя; пустая строка — искать нечего.
+
+    Из запроса берутся только слова, поэтому синтаксис FTS5 в нём
+    не срабатывает.
+    """
+    words = WORD.findall(query.lower())[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def index(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, author_id, group_id) '
+            'VALUES (%s, %s, %s, %s)',
+            [post.pk, post.text, post.author_id, post.group_id],
+        )
+
+
+def remove(post_pk):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_pk])
+
+
+def forget_group(group_pk):
+    """Группу удалили: посты без сигналов получили group = NULL."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET group_id = NULL WHERE group_id = %s',
+            [group_pk],
+        )
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Переиндексирует все посты пачками и возвращает их число.
+
+    Каждая пачка пишется в своей транзакции, так что поиск работает
+    и во время пересборки.
+    """
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'text', 'author_id', 'group_id'
+    )
+    indexed = 0
+    last_pk = 0
+    while True:
+        rows = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid BETWEEN %s AND %s',
+                [rows[0][0], last_pk],
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, text, author_id, group_id) '
+                'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+        indexed += len(rows)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid NOT IN '
+            '(SELECT id FROM posts_post)'
+        )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def matching(query):
+    """Подзапрос id подходящих постов для filter(pk__in=...)."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def facets(expression):
+    """Самые частые авторы и группы среди найденного.
+
+    Возвращает два списка пар (пользователь или группа, число постов).
+    """
+    result = []
+    for column, model in (('author_id', User), ('group_id', Group)):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {column}, COUNT(*) AS found FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s AND {column} IS NOT NULL '
+                f'GROUP BY {column} ORDER BY found DESC, {column} '
+                'LIMIT %s',
+                [expression, FACET_SIZE],
+            )
+            counts = cursor.fetchall()
+        objects = model.objects.in_bulk([pk for pk, _ in counts])
+        result.append([
+            (objects[pk], found) for pk, found in counts if pk in objects
+        ])
+    return result
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация результатов поиска по (rank, id).
+
+    BM25 зависит от всего индекса, поэтому новые посты между запросами
+    страниц могут немного сдвинуть границы, но не повторяют и не
+    теряют посты внутри одной выдачи.
+    """
+
+    def __init__(self, expression, per_page, author=None, group=None,
+                 link_params='', **kwargs):
+        super().__init__(Post.objects.none(), per_page, **kwargs)
+        self.expression = expression
+        self.author = author
+        self.group = group
+        self.link_params = link_params
+
+    def encode(self, direction, post):
+        raw = f'{direction}|{post.rank!r}|{post.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, rank, pk = raw.split('|')
+            position = direction, float(rank), int(pk)
+        except (ValueError, binascii.Error, UnicodeDecodeError):
+            return None
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return position
+
+    def fetch(self, direction, rank=None, pk=None):
+        if not self.expression:
+            return []
+        sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [self.expression]
+        for column, value in (('author_id', self.author),
+                              ('group_id', self.group)):
+            if value is not None:
+                sql += f' AND {column} = %s'
+                params.append(value)
+        lookup, order = ('>', '') if direction == NEXT else ('<', ' DESC')
+        if rank is not None:
+            sql += (
+                f' AND (rank {lookup} %s'
+                f' OR (rank = %s AND rowid {lookup} %s))'
+            )
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank{order}, rowid{order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ranks = dict(cursor.fetchall())
+        posts = Post.objects.select_related('author', 'group').in_bulk(ranks)
+        found = []
+        for post_pk, post_rank in ranks.items():
+            if post_pk in posts:
+                posts[post_pk].rank = post_rank
+                found.append(posts[post_pk])
+        return found
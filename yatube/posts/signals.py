@@ -0,0 +1,188 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from . import (
+    autocomplete, cache_versions, counters, media, search, suggestions,
+    tags, thumbnails, timeline,
+)
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_fragments(sender, instance, **kwargs):
+    # Вход пользователя меняет только last_login, которого нет в ленте.
+    if kwargs.get('update_fields') == {'last_login'}:
+        return
+    cache_versions.bump('user', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def suggest_user(sender, instance, **kwargs):
+    if kwargs.get('update_fields') == {'last_login'}:
+        return
+    transaction.on_commit(lambda: autocomplete.update_user(instance))
+
+
+@receiver(post_delete, sender=User)
+def unsuggest_user(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_user(pk))
+
+
+@receiver(post_save, sender=Group)
+def suggest_group(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.update_group(instance))
+
+
+@receiver(post_delete, sender=Group)
+def unsuggest_group(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_group(pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_fragments(sender, instance, **kwargs):
+    cache_versions.bump('group', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    cache_versions.bump('post', instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if instance.pk is not None:
+        saved = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group', 'image').first()
+        if saved is not None:
+            instance._saved_group_id, instance._saved_image = saved
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_dimensions(sender, instance, **kwargs):
+    # Только для новой загрузки: размеры читаются из заголовка файла.
+    # Форма заполняет их сама при присваивании картинки.
+    image = instance.image
+    if image and not image._committed and instance.image_width is None:
+        sender._meta.get_field('image').update_dimension_fields(
+            instance, force=True
+        )
+
+
+@receiver(post_save, sender=Post)
+def track_post_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name == instance._saved_image:
+        return
+    if instance._saved_image:
+        media.release(instance._saved_image)
+    if not name:
+        return
+    if media.acquire(name) > 1 and media.copy_variants(instance.pk, name):
+        # Такая картинка уже загружена и обработана.
+        return
+    transaction.on_commit(lambda: thumbnails.enqueue(instance.pk, name))
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    if instance.image.name:
+        media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.bump_group(instance._saved_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index(instance)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_tags(sender, instance, **kwargs):
+    tags.sync(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    search.forget_group(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        timeline.mark_celebrities([instance.author_id])
+
+
+@receiver(post_save, sender=Follow)
+def forget_follow_suggestion(sender, instance, created, **kwargs):
+    if created:
+        suggestions.forget(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
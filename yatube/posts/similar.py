@@ -0,0 +1,285 @@
+"""Похожие посты по TF-IDF.
+
+Тексты постов превращаются в разреженную матрицу TF-IDF
+(scipy.sparse, строки нормированы), и косинусная близость двух постов
+становится скалярным произведением их строк. Соседи считаются пачками
+строк: произведение пачки на всю матрицу остаётся разреженным, а из
+каждой его строки argpartition выбирает top_k лучших. Результат
+пишется в SimilarPost, откуда post_detail читает его одним запросом.
+
+Словарь, IDF, матрица и id постов сохраняются в файл модели
+(settings.SIMILAR_POSTS_MODEL). Инкрементальный запуск векторизует
+только посты новее сохранённых по прежнему словарю, находит им
+соседей и подмешивает их в списки старых постов. Новые слова попадают
+в словарь только при полной пересборке.
+"""
+import os
+import re
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from . import cache_versions
+from .models import Post, SimilarPost
+
+# Слова длиннее MAX_TERM_LENGTH (вставленные ссылки, base64 и т. п.)
+# не учитываются: массив терминов хранит строки фиксированной ширины,
+# и одно такое слово раздуло бы каждый его элемент.
+MAX_TERM_LENGTH = 40
+WORD = re.compile(rf'(?<!\w)\w{{2,{MAX_TERM_LENGTH}}}(?!\w)')
+TOP_K = 5
+CHUNK_SIZE = 1000
+BATCH_SIZE = 2000
+# Слова реже MIN_DF постов не связывают посты, а слова чаще чем в
+# доле MAX_DF постов связывают все со всеми.
+MIN_DF = 2
+MAX_DF = 0.5
+
+Model = namedtuple('Model', ('terms', 'idf', 'ids', 'matrix'))
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def post_batches(batch_size=BATCH_SIZE, after=0):
+    """Пачки (id, текст) постов с id больше after, по возрастанию id."""
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    while True:
+        rows = list(posts.filter(pk__gt=after)[:batch_size])
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield rows
+
+
+def count_terms(rows, vocabulary, grow):
+    """Матрица числа вхождений слов; grow — добавлять новые слова."""
+    indptr = [0]
+    indices = []
+    data = []
+    for _, text in rows:
+        for term, count in Counter(tokenize(text)).items():
+            column = vocabulary.get(term)
+            if column is None:
+                if not grow:
+                    continue
+                column = vocabulary[term] = len(vocabulary)
+            indices.append(column)
+            data.append(count)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (
+            np.array(data, dtype=np.float32),
+            np.array(indices, dtype=np.int32),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(rows), len(vocabulary)),
+    )
+
+
+def weigh(counts, idf):
+    """TF-IDF с логарифмическим TF и строками единичной длины."""
+    matrix = counts.astype(np.float32)
+    matrix.data = 1 + np.log(matrix.data)
+    matrix = (matrix @ sparse.diags(idf.astype(np.float32))).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def fit(batches):
+    """Строит модель по всем постам из batches."""
+    vocabulary = {}
+    ids = []
+    parts = []
+    for rows in batches:
+        ids.extend(pk for pk, _ in rows)
+        parts.append(count_terms(rows, vocabulary, grow=True))
+    width = len(vocabulary)
+    for part in parts:
+        part.resize(part.shape[0], width)
+    counts = sparse.vstack(parts, format='csr') if parts else (
+        sparse.csr_matrix((0, width), dtype=np.float32)
+    )
+    total = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=width)
+    columns = np.flatnonzero((df >= MIN_DF) & (df <= MAX_DF * total))
+    idf = np.log((1 + total) / (1 + df[columns])) + 1
+    words = list(vocabulary)
+    terms = np.array([words[column] for column in columns], dtype=str)
+    return Model(
+        terms, idf, np.array(ids, dtype=np.int64),
+        weigh(counts[:, columns], idf),
+    )
+
+
+def extend(model, rows):
+    """Добавляет в модель новые посты, не меняя словарь и IDF."""
+    vocabulary = {term: column for column, term in enumerate(model.terms)}
+    new = weigh(count_terms(rows, vocabulary, grow=False), model.idf)
+    return Model(
+        model.terms,
+        model.idf,
+        np.concatenate([model.ids, [pk for pk, _ in rows]]),
+        sparse.vstack([model.matrix, new], format='csr'),
+    ), new
+
+
+def neighbours(queries, query_ids, model, top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """Для каждой строки queries — (id поста, [(id соседа, близость)]).
+
+    Соседи отсортированы по убыванию близости, сам пост исключён.
+    """
+    transposed = model.matrix.T.tocsr()
+    for start in range(0, queries.shape[0], chunk_size):
+        product = (queries[start:start + chunk_size] @ transposed).tocsr()
+        for row in range(product.shape[0]):
+            begin, end = product.indptr[row], product.indptr[row + 1]
+            found = model.ids[product.indices[begin:end]]
+            scores = product.data[begin:end]
+            post_id = int(query_ids[start + row])
+            keep = (found != post_id) & (scores > 0)
+            found, scores = found[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                found, scores = found[best], scores[best]
+            order = np.argsort(-scores, kind='stable')
+            yield post_id, list(zip(
+                found[order].tolist(), scores[order].tolist()
+            ))
+
+
+def store(results):
+    """Заменяет списки похожих постов; results — [(id, [(id, близость)])].
+
+    Посты, удалённые после построения модели, пропускаются.
+    """
+    results = list(results)
+    if not results:
+        return
+    mentioned = {pk for pk, _ in results}
+    for _, similar in results:
+        mentioned.update(pk for pk, _ in similar)
+    existing = set(Post.objects.filter(
+        pk__in=mentioned
+    ).values_list('pk', flat=True))
+    entries = []
+    for pk, similar in results:
+        if pk not in existing:
+            continue
+        similar = [item for item in similar if item[0] in existing]
+        entries.extend(
+            SimilarPost(post_id=pk, similar_id=similar_pk, rank=rank,
+                        score=score)
+            for rank, (similar_pk, score) in enumerate(similar)
+        )
+    with transaction.atomic():
+        SimilarPost.objects.filter(
+            post__in=[pk for pk, _ in results]
+        ).delete()
+        SimilarPost.objects.bulk_create(entries)
+    # Блок похожих постов входит в страницу и её ETag.
+    for pk, _ in results:
+        cache_versions.bump('post', pk)
+
+
+def build(top_k=TOP_K, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """Полная пересборка; возвращает число постов в модели."""
+    model = fit(post_batches(batch_size))
+    _store_chunked(
+        neighbours(model.matrix, model.ids, model, top_k, chunk_size),
+        chunk_size,
+    )
+    save(model)
+    return len(model.ids)
+
+
+def update(top_k=TOP_K, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """Добавляет посты новее модели; возвращает их число.
+
+    Без сохранённой модели выполняет полную пересборку.
+    """
+    model = load()
+    if model is None:
+        return build(top_k, chunk_size, batch_size)
+    after = int(model.ids.max()) if len(model.ids) else 0
+    added = 0
+    for rows in post_batches(batch_size, after):
+        old = model
+        model, new = extend(model, rows)
+        new_ids = model.ids[-len(rows):]
+        _store_chunked(
+            neighbours(new, new_ids, model, top_k, chunk_size), chunk_size
+        )
+        _merge_into_old(old, new, new_ids, top_k, chunk_size)
+        added += len(rows)
+    save(model)
+    return added
+
+
+def _merge_into_old(old, new, new_ids, top_k, chunk_size):
+    """Подмешивает новые посты в списки старых, если они ближе."""
+    product = (old.matrix @ new.T).tocsr()
+    touched = np.flatnonzero(np.diff(product.indptr))
+    for start in range(0, len(touched), chunk_size):
+        rows = touched[start:start + chunk_size]
+        post_ids = old.ids[rows].tolist()
+        current = {pk: [] for pk in post_ids}
+        saved = SimilarPost.objects.filter(post__in=post_ids).order_by(
+            'post', 'rank'
+        ).values_list('post', 'similar', 'score')
+        for pk, similar_pk, score in saved:
+            current[pk].append((similar_pk, score))
+        results = []
+        for row, pk in zip(rows, post_ids):
+            begin, end = product.indptr[row], product.indptr[row + 1]
+            candidates = current[pk] + list(zip(
+                new_ids[product.indices[begin:end]].tolist(),
+                product.data[begin:end].tolist(),
+            ))
+            candidates.sort(key=lambda item: -item[1])
+            results.append((pk, candidates[:top_k]))
+        store(results)
+
+
+def _store_chunked(results, chunk_size):
+    chunk = []
+    for result in results:
+        chunk.append(result)
+        if len(chunk) >= chunk_size:
+            store(chunk)
+            chunk = []
+    store(chunk)
+
+
+def save(model, path=None):
+    path = path or settings.SIMILAR_POSTS_MODEL
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as target:
+        np.savez(
+            target,
+            terms=model.terms,
+            idf=model.idf,
+            ids=model.ids,
+            data=model.matrix.data,
+            indices=model.matrix.indices,
+            indptr=model.matrix.indptr,
+            shape=np.array(model.matrix.shape),
+        )
+    os.replace(temporary, path)
+
+
+def load(path=None):
+    path = path or settings.SIMILAR_POSTS_MODEL
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        matrix = sparse.csr_matrix(
+            (saved['data'], saved['indices'], saved['indptr']),
+            shape=tuple(saved['shape']),
+        )
+        return Model(saved['terms'], saved['idf'], saved['ids'], matrix)
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+SHARDED_NAME = re.compile(
+    r'^(?:(?P<directory>.+)/)?(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/'
+    r'(?P=a)(?P=b)[0-9a-f]{60}\.\w+$'
+)
+
+
+def sharded_name(directory, digest, extension):
+    return '/'.join(filter(None, (
+        directory, digest[:2], digest[2:4], digest + extension
+    )))
+
+
+def is_sharded(name):
+    return SHARDED_NAME.match(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, которое называет файлы по SHA-256 содержимого.
+
+    Одинаковые загрузки получают одно имя и хранятся один раз; сколько
+    постов ссылается на файл, считает MediaFile (см. posts/media.py).
+    Каталог и расширение берутся из исходного имени, а внутри каталога
+    файлы разложены по двум уровням подкаталогов из начала хеша:
+    posts/ab/cd/abcd….jpg. Так в одном каталоге не больше нескольких
+    тысяч файлов даже при миллионах картинок.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return sharded_name(directory, digest.hexdigest(), extension)
+
+    def replace(self, name, content):
+        """Перезаписывает файл под прежним именем, не пересчитывая хеш."""
+        if self.exists(name):
+            self.delete(name)
+        return super().save(name, content)
@@ -0,0 +1,181 @@
+"""Кого почитать: подсказки авторов по графу подписок.
+
+Подписки загружаются в разреженную матрицу A в формате CSR: строка —
+подписчик, столбец — автор, пользователи пронумерованы подряд. Оценка
+кандидата складывается из двух частей:
+
+* друзья друзей, A @ A — сколько авторов из подписок пользователя сами
+  подписаны на кандидата;
+* совместные подписки, (A @ Aᵀ) @ D⁻¹A — на кандидата подписаны люди
+  с похожими подписками; вклад каждого делится на число его подписок,
+  чтобы подписанные на всех не перевешивали.
+
+Строки считаются пачками: из каждой пачки вычитаются сам пользователь
+и уже читаемые авторы, а argpartition оставляет top_n лучших. Результат
+пишется в FollowSuggestion, откуда страницы читают его одним запросом.
+Подписка на предложенного автора сразу убирает его из списка, а
+остальное обновляется при следующем запуске.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from . import cache_versions
+from .models import Follow, FollowSuggestion, User
+
+TOP_N = 10
+SHOWN = 5
+CHUNK_SIZE = 1000
+BATCH_SIZE = 10000
+COFOLLOW_WEIGHT = 0.5
+VERSION = 'suggestions'
+
+Graph = namedtuple('Graph', ('ids', 'follows'))
+
+
+def load_graph(batch_size=BATCH_SIZE):
+    """Граф подписок: id пользователей по порядку номеров и матрица A."""
+    follows = Follow.objects.order_by('pk').values_list(
+        'pk', 'user', 'author'
+    )
+    parts = []
+    last_pk = 0
+    while True:
+        rows = list(follows.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        parts.append(np.array(rows, dtype=np.int64)[:, 1:])
+    edges = np.concatenate(parts) if parts else np.empty((0, 2), np.int64)
+    ids, numbers = np.unique(edges.ravel(), return_inverse=True)
+    numbers = numbers.reshape(edges.shape)
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(len(edges), dtype=np.float32),
+            (numbers[:, 0], numbers[:, 1]),
+        ),
+        shape=(len(ids), len(ids)),
+    )
+    return Graph(ids, matrix)
+
+
+def suggest(graph, top_n=TOP_N, chunk_size=CHUNK_SIZE,
+            weight=COFOLLOW_WEIGHT):
+    """Для каждого подписчика — (id, [(id автора, оценка)]) по убыванию."""
+    follows = graph.follows
+    followers = follows.T.tocsr()
+    counts = np.asarray(follows.sum(axis=1)).ravel()
+    counts[counts == 0] = 1
+    spread = (sparse.diags(1 / counts) @ follows).tocsr()
+    for start in range(0, follows.shape[0], chunk_size):
+        rows = follows[start:start + chunk_size]
+        size = rows.shape[0]
+        # Сам пользователь среди похожих на себя добавляет оценку только
+        # уже читаемым авторам, а их всё равно вычитаем ниже.
+        scores = rows @ follows + weight * ((rows @ followers) @ spread)
+        own = sparse.csr_matrix(
+            (
+                np.ones(size, dtype=np.float32),
+                (np.arange(size), np.arange(start, start + size)),
+            ),
+            shape=scores.shape,
+        )
+        scores = scores - scores.multiply((rows + own) > 0)
+        scores = scores.tocsr()
+        scores.eliminate_zeros()
+        for row in range(size):
+            if rows.indptr[row] == rows.indptr[row + 1]:
+                continue
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            found = graph.ids[scores.indices[begin:end]]
+            values = scores.data[begin:end]
+            if len(values) > top_n:
+                best = np.argpartition(-values, top_n)[:top_n]
+                found, values = found[best], values[best]
+            order = np.lexsort((found, -values))
+            yield int(graph.ids[start + row]), list(zip(
+                found[order].tolist(), values[order].tolist()
+            ))
+
+
+def store(results):
+    """Заменяет списки подсказок; results — [(id, [(id, оценка)])].
+
+    Удалённые и неактивные пользователи пропускаются.
+    """
+    results = list(results)
+    if not results:
+        return
+    mentioned = {pk for pk, _ in results}
+    for _, suggested in results:
+        mentioned.update(pk for pk, _ in suggested)
+    active = set(User.objects.filter(
+        pk__in=mentioned, is_active=True
+    ).values_list('pk', flat=True))
+    entries = []
+    for pk, suggested in results:
+        suggested = [item for item in suggested if item[0] in active]
+        entries.extend(
+            FollowSuggestion(user_id=pk, suggested_id=suggested_pk,
+                             rank=rank, score=score)
+            for rank, (suggested_pk, score) in enumerate(suggested)
+        )
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(
+            user__in=[pk for pk, _ in results]
+        ).delete()
+        FollowSuggestion.objects.bulk_create(entries)
+    for pk, _ in results:
+        cache_versions.bump(VERSION, pk)
+
+
+def build(top_n=TOP_N, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """Пересчитывает все подсказки; возвращает число подписчиков."""
+    graph = load_graph(batch_size)
+    chunk = []
+    users = 0
+    for result in suggest(graph, top_n, chunk_size):
+        chunk.append(result)
+        users += 1
+        if len(chunk) >= chunk_size:
+            store(chunk)
+            chunk = []
+    store(chunk)
+    # Кто с прошлого запуска отписался от всех, остался со старым списком.
+    stale = list(FollowSuggestion.objects.filter(
+        user__follower__isnull=True
+    ).values_list('user', flat=True).distinct())
+    FollowSuggestion.objects.filter(user__in=stale).delete()
+    for pk in stale:
+        cache_versions.bump(VERSION, pk)
+    return users
+
+
+def forget(user_pk, author_pk):
+    """Пользователь подписался на автора: больше его не предлагать."""
+    if FollowSuggestion.objects.filter(
+        user=user_pk, suggested=author_pk
+    ).delete()[0]:
+        cache_versions.bump(VERSION, user_pk)
+
+
+def for_user(user, exclude=None, limit=SHOWN):
+    """Подсказки для страницы: не больше limit, кроме автора exclude."""
+    if not user.is_authenticated:
+        return []
+    entries = FollowSuggestion.objects.filter(
+        user=user, suggested__is_active=True
+    ).select_related('suggested').order_by('rank')
+    if exclude is not None:
+        entries = entries.exclude(suggested=exclude)
+    return list(entries[:limit])
+
+
+def version(user):
+    """Версия подсказок пользователя для ETag страниц с ними."""
+    if not user.is_authenticated:
+        return None
+    pair = VERSION, user.pk
+    return cache_versions.get_versions([pair])[pair]
@@ -0,0 +1,81 @@
+"""Хештеги в тексте постов и ленты по ним."""
+import re
+
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import PostTag
+from .paginators import CursorPaginator, keyset
+
+MAX_LENGTH = 50
+MAX_TAGS = 20
+# Решётка после буквы или & — часть слова или HTML-сущности (&#39;).
+HASHTAG = re.compile(r'(?<![\w&#])#(\w{1,%d})(?!\w)' % MAX_LENGTH)
+TAG_NAME = re.compile(r'^\w{1,%d}$' % MAX_LENGTH)
+
+
+def extract(text):
+    """Теги текста в нижнем регистре, без повторов, в порядке появления."""
+    tags = dict.fromkeys(
+        match.group(1).lower() for match in HASHTAG.finditer(text)
+    )
+    return list(tags)[:MAX_TAGS]
+
+
+def is_valid(name):
+    return TAG_NAME.match(name) is not None
+
+
+def sync(post):
+    """Приводит теги поста в базе к тегам его текста."""
+    tags = set(extract(post.text))
+    saved = set(
+        PostTag.objects.filter(post=post).values_list('tag', flat=True)
+    )
+    if saved - tags:
+        PostTag.objects.filter(post=post, tag__in=saved - tags).delete()
+    PostTag.objects.bulk_create(
+        (
+            PostTag(tag=tag, post=post, pub_date=post.pub_date)
+            for tag in tags - saved
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def linkify(html):
+    """Заменяет хештеги в уже экранированном тексте ссылками на ленты."""
+    return HASHTAG.sub(
+        lambda match: format_html(
+            '<a href="{}">#{}</a>',
+            reverse('posts:tag_posts', args=(match.group(1).lower(),)),
+            match.group(1),
+        ),
+        html,
+    )
+
+
+class TagPaginator(CursorPaginator):
+    """Курсорная пагинация ленты тега по индексу (tag, pub_date, post).
+
+    Если задан post_fields, посты загружаются только с этими полями.
+    """
+
+    def __init__(self, tag, per_page, post_fields=None, **kwargs):
+        entries = PostTag.objects.filter(tag=tag).order_by(
+            '-pub_date', '-post'
+        )
+        super().__init__(entries, per_page, **kwargs)
+        self.post_fields = post_fields
+
+    def fetch(self, direction, pub_date=None, pk=None):
+        entries = keyset(
+            self.object_list, direction, pub_date, pk, id_field='post_id'
+        )
+        if self.post_fields:
+            entries = entries.select_related('post').only(
+                'post', *(f'post__{field}' for field in self.post_fields)
+            )
+        else:
+            entries = entries.select_related('post__author', 'post__group')
+        return [entry.post for entry in entries[:self.per_page + 1]]
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.cache_versions import page_version
+
+register = template.Library()
+
+
+@register.filter
+def cache_version(page_obj):
+    return page_version(page_obj)
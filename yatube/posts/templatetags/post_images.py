@@ -0,0 +1,13 @@
+from django import template
+
+from posts.resize import resized_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def resized(image, width, height):
+    """Ссылка на картинку поста, уменьшенную и обрезанную до width×height."""
+    if not image:
+        return ''
+    return resized_url(image.name, width, height)
@@ -0,0 +1,16 @@
+from django import template
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from posts.tags import linkify
+
+register = template.Library()
+
+
+@register.filter(is_safe=True)
+def hashtags(html):
+    """Ссылки на ленты тегов в тексте поста.
+
+    Ставится после linebreaksbr; неэкранированный текст экранируется.
+    """
+    return mark_safe(linkify(conditional_escape(html)))
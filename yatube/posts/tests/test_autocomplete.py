@@ -0,0 +1,162 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from .. import autocomplete
+from ..models import Group, User
+
+
+def run_on_commit(func):
+    func()
+
+
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.GROUP = Group.objects.create(
+            title='Любители литературы',
+            slug='literature',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+        # Фоновый поток не видит данных теста, поэтому индекс
+        # строится здесь.
+        autocomplete._index = autocomplete._version = None
+        autocomplete._rebuild(autocomplete._current_version())
+
+    def suggest(self, query):
+        response = self.guest_client.get(
+            reverse('posts:autocomplete'), {'q': query}
+        )
+        self.assertTrue(response.json()['complete'])
+        return [
+            (result['type'], result['label'], result['url'])
+            for result in response.json()['results']
+        ]
+
+    def test_matches_usernames_names_and_groups(self):
+        user = (
+            'user', 'Лев Толстой (leo)',
+            reverse('posts:profile', args=('leo',)),
+        )
+        group = (
+            'group', 'Любители литературы',
+            reverse('posts:group_list', args=('literature',)),
+        )
+        cases = {
+            'le': [user],
+            'ЛЕ': [user],
+            'толс': [user],
+            'лев т': [user],
+            'lit': [group],
+            'литер': [group],
+            'л': [user, group],
+            'нет': [],
+            '': [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertCountEqual(self.suggest(query), expected)
+
+    def test_first_build_runs_in_background(self):
+        autocomplete._index = autocomplete._version = None
+        with mock.patch('posts.autocomplete.threading.Thread') as thread:
+            response = self.guest_client.get(
+                reverse('posts:autocomplete'), {'q': 'le'}
+            )
+            self.guest_client.get(reverse('posts:autocomplete'), {'q': 'l'})
+        self.assertEqual(
+            response.json(), {'results': [], 'complete': False}
+        )
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        thread.return_value.start.assert_called_once()
+        autocomplete._rebuilding = False
+
+    def test_index_is_served_from_memory(self):
+        self.suggest('le')
+        with CaptureQueriesContext(connection) as context:
+            self.suggest('lit')
+        self.assertEqual(len(context), 0)
+
+    def test_signals_keep_index_fresh(self):
+        self.suggest('le')
+        self.USER.first_name = 'Лёва'
+        self.USER.save()
+        other = User.objects.create_user(username='levin')
+        self.assertEqual(
+            [label for _, label, _ in self.suggest('лё')],
+            ['Лёва Толстой (leo)'],
+        )
+        self.assertEqual(len(self.suggest('le')), 2)
+        other.delete()
+        Group.objects.filter(pk=self.GROUP.pk).get().delete()
+        self.assertEqual(len(self.suggest('le')), 1)
+        self.assertEqual(self.suggest('lit'), [])
+
+    def test_other_process_change_triggers_rebuild(self):
+        self.suggest('le')
+        with mock.patch('posts.autocomplete.threading.Thread') as thread:
+            autocomplete.cache_versions.bump(*autocomplete.VERSION)
+            self.suggest('le')
+        thread.return_value.start.assert_called_once()
+        autocomplete._rebuilding = False
+
+    def test_other_process_change_is_applied_without_rebuild(self):
+        self.suggest('le')
+        index, version = autocomplete._index, autocomplete._version
+        # Изменение из другого процесса: в кеше оно есть, а в индексе
+        # этого процесса — нет.
+        autocomplete._index = None
+        Group.objects.create(
+            title='Литературный клуб', slug='club', description='',
+        )
+        autocomplete._index, autocomplete._version = index, version
+        with mock.patch('posts.autocomplete.threading.Thread') as thread:
+            self.assertEqual(len(self.suggest('лит')), 2)
+        thread.assert_not_called()
+        self.assertEqual(
+            autocomplete._version,
+            autocomplete.cache_versions.get_versions(
+                [autocomplete.VERSION]
+            )[autocomplete.VERSION],
+        )
+
+    def test_index_built_at_once_matches_added_one_by_one(self):
+        entries = [
+            (autocomplete.Suggestion('user', pk, f'user{pk}', ''),
+             [f'user{pk % 7}', f'Name{pk}'])
+            for pk in range(30)
+        ]
+        added = autocomplete.PrefixIndex()
+        for entry in reversed(entries):
+            added.add(*entry)
+        built = autocomplete.PrefixIndex(entries)
+        self.assertEqual(built.keys, added.keys)
+        self.assertEqual(built.objects, added.objects)
+        self.assertEqual(
+            built.search('user3', limit=50), added.search('user3', limit=50)
+        )
+
+    def test_search_stops_at_limit_and_budget(self):
+        index = autocomplete.PrefixIndex()
+        for pk in range(50):
+            index.add(
+                autocomplete.Suggestion('user', pk, f'user{pk}', ''),
+                [f'user{pk}'],
+            )
+        found, complete = index.search('user', limit=5)
+        self.assertEqual((len(found), complete), (5, True))
+        found, complete = index.search('user', limit=50, deadline=0)
+        self.assertEqual((len(found), complete), (1, False))
@@ -29,23 +29,56 @@ class CacheTests(TestCase):
     def setUp(self):
         self.authorized_test_author = Client()
         self.authorized_test_author.force_login(self.USER)
+        cache.clear()
 
-    def test_cache_main_page(self):
-        response = self.authorized_test_author.get(
-            reverse('posts:main_page')
-        )
-        context_obj = response.context['page_obj']
-        self.assertEqual(context_obj[0].text, 'Тестовый текст')
-        content_obj = response.content
-        Post.objects.get(id=1).delete()
-        response_2 = self.authorized_test_author.get(
+    def get_main_page(self):
+        return self.authorized_test_author.get(
             reverse('posts:main_page')
-        )
-        content_obj_2 = response_2.content
-        self.assertEqual(content_obj, content_obj_2)
+        ).content.decode()
+
+    def test_cache_main_page(self):
+        content = self.get_main_page()
+        self.assertIn(TEXT_FOR_TEST, content)
+        # Обновление в обход сигналов не меняет ключ: страница из кеша.
+        Post.objects.filter(pk=self.POST.pk).update(text='Изменён тихо')
+        self.assertEqual(self.get_main_page(), content)
         cache.clear()
-        response_3 = self.authorized_test_author.get(
-            reverse('posts:main_page')
+        self.assertIn('Изменён тихо', self.get_main_page())
+
+    def test_post_delete_invalidates_main_page(self):
+        content = self.get_main_page()
+        Post.objects.get(pk=self.POST.pk).delete()
+        self.assertNotEqual(self.get_main_page(), content)
+        self.assertNotIn(TEXT_FOR_TEST, self.get_main_page())
+
+    def test_related_changes_invalidate_main_page(self):
+        self.get_main_page()
+        post = Post.objects.get(pk=self.POST.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertIn('Новый текст', self.get_main_page())
+        self.USER.first_name = 'Лев'
+        self.USER.save()
+        self.assertIn('Лев', self.get_main_page())
+        self.GROUP.slug = 'new_slug'
+        self.GROUP.save()
+        self.assertIn('/group/new_slug/', self.get_main_page())
+
+    def test_new_post_keeps_older_cursor_pages_cached(self):
+        for i in range(10):
+            Post.objects.create(text=f'{TEXT_FOR_TEST} {i}', author=self.USER)
+        response = self.authorized_test_author.get(reverse('posts:main_page'))
+        cursor = response.context['page_obj'].paginator.next_cursor
+        second_page = self.authorized_test_author.get(
+            reverse('posts:main_page'), {'cursor': cursor}
+        ).content
+        Post.objects.create(text='Свежий пост', author=self.USER)
+        # Вторая страница по курсору не сдвинулась, её ключ прежний.
+        Post.objects.filter(pk=self.POST.pk).update(text='Изменён тихо')
+        self.assertEqual(
+            self.authorized_test_author.get(
+                reverse('posts:main_page'), {'cursor': cursor}
+            ).content,
+            second_page,
         )
-        content_obj_3 = response_3.content
-        self.assertNotEqual(content_obj, content_obj_3)
+        self.assertIn('Свежий пост', self.get_main_page())
@@ -0,0 +1,146 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.cache import cache
+from django.utils.http import http_date
+from http import HTTPStatus
+
+from ..models import Comment, Follow, Post, Group, User
+
+TITLE_FOR_TEST = 'Тестовая группа'
+SLUG_FOR_TEST = 'test_slug'
+DESCRIPTION_FOR_TEST = 'Тестовое описание'
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+        cls.READER = User.objects.create_user(username='reader')
+        cls.GROUP = Group.objects.create(
+            title=TITLE_FOR_TEST,
+            slug=SLUG_FOR_TEST,
+            description=DESCRIPTION_FOR_TEST,
+        )
+        cls.POST = Post.objects.create(
+            text=TEXT_FOR_TEST,
+            author=cls.USER,
+            group=cls.GROUP,
+        )
+        Follow.objects.create(user=cls.READER, author=cls.USER)
+        cls.PAGES_NAMES = [
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': cls.GROUP.slug}),
+            reverse('posts:profile', kwargs={'username': cls.USER.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.POST.pk}),
+            reverse('posts:follow_index'),
+        ]
+        cls.DETAIL_URL = cls.PAGES_NAMES[3]
+
+    def setUp(self):
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.READER)
+        cache.clear()
+
+    def revalidate(self, url, response):
+        return self.authorized_reader.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url in self.PAGES_NAMES:
+            with self.subTest(url=url):
+                response = self.authorized_reader.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    response.has_header('Last-Modified'),
+                    url == self.DETAIL_URL,
+                )
+                response_2 = self.revalidate(url, response)
+                self.assertEqual(
+                    response_2.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertFalse(response_2.templates)
+
+    def test_new_post_changes_feed_validators(self):
+        for url in self.PAGES_NAMES:
+            if 'posts/' in url:
+                continue
+            with self.subTest(url=url):
+                response = self.authorized_reader.get(url)
+                Post.objects.create(
+                    text=TEXT_FOR_TEST, author=self.USER, group=self.GROUP
+                )
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, HTTPStatus.OK
+                )
+
+    def test_feeds_ignore_if_modified_since(self):
+        # Дата последней правки на странице ленты может уйти назад после
+        # удаления поста, поэтому ленты сверяются только по ETag.
+        for url in self.PAGES_NAMES:
+            if url == self.DETAIL_URL:
+                continue
+            with self.subTest(url=url):
+                post = Post.objects.create(
+                    text=TEXT_FOR_TEST, author=self.USER, group=self.GROUP
+                )
+                newest = self.authorized_reader.get(url)
+                post.delete()
+                response = self.authorized_reader.get(
+                    url, HTTP_IF_MODIFIED_SINCE=http_date()
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], newest['ETag'])
+
+    def test_edit_and_comment_change_detail_validators(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.POST.pk})
+        response = self.authorized_reader.get(url)
+        Comment.objects.create(
+            post=self.POST, author=self.READER, text=TEXT_FOR_TEST
+        )
+        self.assertEqual(
+            self.revalidate(url, response).status_code, HTTPStatus.OK
+        )
+        response = self.authorized_reader.get(url)
+        post = Post.objects.get(pk=self.POST.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(
+            self.revalidate(url, response).status_code, HTTPStatus.OK
+        )
+
+    def test_validators_depend_on_user(self):
+        url = reverse('posts:main_page')
+        response = self.authorized_reader.get(url)
+        response_2 = Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_2.status_code, HTTPStatus.OK)
+
+    def test_new_csrf_secret_changes_detail_validators(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.POST.pk})
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.READER)
+        response = client.get(url)
+        self.assertEqual(
+            client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        client.logout()
+        client.force_login(self.READER)
+        response_2 = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_2.status_code, HTTPStatus.OK)
+        client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.POST.pk}),
+            {
+                'text': TEXT_FOR_TEST,
+                'csrfmiddlewaretoken': str(response_2.context['csrf_token']),
+            },
+        )
+        self.assertTrue(
+            Comment.objects.filter(
+                post=self.POST, author=self.READER
+            ).exists()
+        )
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Group, Post, User, UserCounters
+
+TITLE_FOR_TEST = 'Тестовая группа'
+SLUG_FOR_TEST = 'test_slug'
+DESCRIPTION_FOR_TEST = 'Тестовое описание'
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+        cls.READER = User.objects.create_user(username='reader')
+        cls.GROUP = Group.objects.create(
+            title=TITLE_FOR_TEST,
+            slug=SLUG_FOR_TEST,
+            description=DESCRIPTION_FOR_TEST,
+        )
+        cls.GROUP_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test_slug_2',
+            description=DESCRIPTION_FOR_TEST,
+        )
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.READER)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        self.authorized_test_author.post(
+            reverse('posts:post_create'),
+            data={'text': TEXT_FOR_TEST, 'group': self.GROUP.pk},
+        )
+        post = Post.objects.get(author=self.USER)
+        self.assertEqual(self.counters(self.USER).posts_count, 1)
+        self.GROUP.refresh_from_db()
+        self.assertEqual(self.GROUP.posts_count, 1)
+        self.authorized_reader.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Тестовый комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.authorized_test_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': TEXT_FOR_TEST, 'group': self.GROUP_2.pk},
+        )
+        self.GROUP.refresh_from_db()
+        self.GROUP_2.refresh_from_db()
+        self.assertEqual(self.GROUP.posts_count, 0)
+        self.assertEqual(self.GROUP_2.posts_count, 1)
+        post.refresh_from_db()
+        post.delete()
+        self.GROUP_2.refresh_from_db()
+        self.assertEqual(self.counters(self.USER).posts_count, 0)
+        self.assertEqual(self.GROUP_2.posts_count, 0)
+
+    def test_follow_counters(self):
+        url_kwargs = {'username': self.USER.username}
+        self.authorized_reader.get(
+            reverse('posts:profile_follow', kwargs=url_kwargs)
+        )
+        self.authorized_reader.get(
+            reverse('posts:profile_follow', kwargs=url_kwargs)
+        )
+        self.assertEqual(self.counters(self.USER).followers_count, 1)
+        self.assertEqual(self.counters(self.READER).following_count, 1)
+        self.authorized_reader.get(
+            reverse('posts:profile_unfollow', kwargs=url_kwargs)
+        )
+        self.assertEqual(self.counters(self.USER).followers_count, 0)
+        self.assertEqual(self.counters(self.READER).following_count, 0)
+
+    def test_recount_command_fixes_drift(self):
+        Post.objects.create(text=TEXT_FOR_TEST, author=self.USER)
+        UserCounters.objects.filter(user=self.USER).update(posts_count=42)
+        UserCounters.objects.filter(user=self.READER).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.USER).posts_count, 1)
+        self.assertEqual(self.counters(self.READER).posts_count, 0)
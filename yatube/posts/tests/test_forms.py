@@ -173,7 +173,8 @@ class FormsTestsPicture(TestCase):
         self.assertEqual(post1.text, 'Тестовый текст1')
         self.assertEqual(post1.author.username, 'test_author')
         self.assertEqual(post1.group.title, 'Тестовая группа')
-        self.assertEqual(post1.image, 'posts/small1.gif')
+        # Картинка совпадает с уже загруженной и хранится одним файлом.
+        self.assertEqual(post1.image, self.POST.image.name)
 
 
 class CommentTests(TestCase):
@@ -0,0 +1,121 @@
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.cache import cache
+
+from ..models import Comment, Follow, Group, Post, User
+
+TITLE_FOR_TEST = 'Тестовая группа'
+SLUG_FOR_TEST = 'test_slug'
+DESCRIPTION_FOR_TEST = 'Тестовое описание'
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+        cls.READER = User.objects.create_user(username='reader')
+        cls.GROUP = Group.objects.create(
+            title=TITLE_FOR_TEST,
+            slug=SLUG_FOR_TEST,
+            description=DESCRIPTION_FOR_TEST,
+        )
+        for i in range(15):
+            cls.POST = Post.objects.create(
+                text=f'{TEXT_FOR_TEST} {i}',
+                author=cls.USER,
+                group=cls.GROUP,
+            )
+        Comment.objects.create(
+            post=cls.POST, author=cls.READER, text=TEXT_FOR_TEST
+        )
+        Follow.objects.create(user=cls.READER, author=cls.USER)
+
+    def setUp(self):
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.READER)
+        cache.clear()
+
+    def plans(self, url, table):
+        """Планы всех запросов представления к таблице table."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_reader.get(url)
+        queries = context.captured_queries
+        # Вторая страница добавляет к запросу условие по курсору.
+        next_cursor = response.context['page_obj'].paginator.next_cursor
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_reader.get(url, {'cursor': next_cursor})
+        queries += context.captured_queries
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if f'FROM "{table}"' not in query['sql']:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append(
+                    ' '.join(str(row[-1]) for row in cursor.fetchall())
+                )
+        return plans
+
+    def assertIndexUsed(self, plans, index_name):
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn(index_name, plan)
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_feeds_use_composite_indexes(self):
+        cases = {
+            reverse('posts:main_page'): 'post_pub_date_idx',
+            reverse(
+                'posts:group_list', kwargs={'slug': self.GROUP.slug}
+            ): 'post_group_pub_date_idx',
+            reverse(
+                'posts:profile', kwargs={'username': self.USER.username}
+            ): 'post_author_pub_date_idx',
+        }
+        for url, index_name in cases.items():
+            with self.subTest(url=url):
+                self.assertIndexUsed(self.plans(url, 'posts_post'), index_name)
+
+    def test_follow_feed_uses_timeline_index(self):
+        self.assertIndexUsed(
+            self.plans(reverse('posts:follow_index'), 'posts_timelineentry'),
+            'timeline_user_pub_date_idx',
+        )
+
+    def test_comments_use_composite_index(self):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_reader.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.POST.pk})
+            )
+        sql = next(
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_comment"' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('comment_post_created_idx', plan)
+
+    def test_follow_lookup_uses_unique_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN QUERY PLAN SELECT 1 FROM "posts_follow" '
+                'WHERE "user_id" = %s AND "author_id" = %s',
+                [self.READER.pk, self.USER.pk],
+            )
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        # Ограничение уникальности SQLite хранит как автоиндекс.
+        self.assertIn('COVERING INDEX', plan)
+        self.assertIn('user_id=? AND author_id=?', plan)
+
+    def test_follow_is_unique(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.READER, author=self.USER)
@@ -0,0 +1,328 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import media, thumbnails
+from ..models import MediaFile, Post, User
+from ..storage import is_sharded
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+def image_file(color, name='image.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+@mock.patch('posts.media.transaction.on_commit', run_on_commit)
+class MediaFileTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+
+    def create_post(self, color, name='image.png'):
+        self.authorized_test_author.post(
+            reverse('posts:post_create'),
+            data={'text': TEXT_FOR_TEST, 'image': image_file(color, name)},
+        )
+        return Post.objects.filter(author=self.USER).latest('pk')
+
+    def refcount(self, name):
+        return MediaFile.objects.filter(
+            name=name
+        ).values_list('refcount', flat=True).first()
+
+    def assertStored(self, name, stored=True):
+        for path in (name, thumbnails.thumbnail_name(name, 'feed')):
+            self.assertEqual(default_storage.exists(path), stored, path)
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post((1, 2, 3), 'first.png')
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            second = self.create_post((1, 2, 3), 'second.png')
+        enqueue.assert_not_called()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refcount(first.image.name), 2)
+        self.assertEqual(second.image_variants, first.image_variants)
+
+    def test_delete_releases_and_removes_last_reference(self):
+        first = self.create_post((4, 5, 6))
+        second = self.create_post((4, 5, 6))
+        name = first.image.name
+        first.delete()
+        self.assertEqual(self.refcount(name), 1)
+        self.assertStored(name)
+        second.delete()
+        self.assertIsNone(self.refcount(name))
+        self.assertStored(name, stored=False)
+
+    def test_edit_releases_replaced_image(self):
+        post = self.create_post((7, 8, 9))
+        old_name = post.image.name
+        self.authorized_test_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': TEXT_FOR_TEST, 'image': image_file((9, 8, 7))},
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertIsNone(self.refcount(old_name))
+        self.assertStored(old_name, stored=False)
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def test_cascade_delete_releases_images(self):
+        user = User.objects.create_user(username='other_author')
+        post = Post.objects.create(
+            text=TEXT_FOR_TEST, author=user, image=image_file((10, 11, 12))
+        )
+        name = post.image.name
+        self.assertEqual(self.refcount(name), 1)
+        user.delete()
+        self.assertIsNone(self.refcount(name))
+        self.assertStored(name, stored=False)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+@mock.patch('posts.media.transaction.on_commit', run_on_commit)
+class MediaLayoutTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content=b'data', age=2 * 60 * 60):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            target.write(content)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+
+    def test_upload_is_sharded(self):
+        post = Post.objects.create(
+            text=TEXT_FOR_TEST, author=self.USER, image=image_file((1, 1, 1))
+        )
+        self.assertTrue(is_sharded(post.image.name))
+        self.assertTrue(post.image.name.startswith('posts/'))
+
+    def test_shard_media_moves_legacy_files(self):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), (2, 2, 2)).save(buffer, 'PNG')
+        self.write('posts/legacy.png', buffer.getvalue())
+        legacy_thumbnail = media._legacy_derived_names('posts/legacy.png')[0]
+        self.write(legacy_thumbnail)
+        legacy_variants = json.dumps({'image/jpeg': [
+            [media._legacy_derived_names('posts/legacy.png')[-1], 320, 113]
+        ]})
+        post = Post.objects.create(text=TEXT_FOR_TEST, author=self.USER)
+        Post.objects.filter(pk=post.pk).update(
+            image='posts/legacy.png', image_variants=legacy_variants
+        )
+        MediaFile.objects.create(name='posts/legacy.png', refcount=1)
+        call_command('shard_media', stdout=StringIO())
+        post.refresh_from_db()
+        name = post.image.name
+        self.assertTrue(is_sharded(name))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists('posts/legacy.png'))
+        self.assertFalse(default_storage.exists(legacy_thumbnail))
+        self.assertTrue(
+            default_storage.exists(thumbnails.thumbnail_name(name, 'feed'))
+        )
+        self.assertEqual(
+            json.loads(post.image_variants)['image/jpeg'][0][0],
+            thumbnails.variant_name(name, 960, 'JPEG'),
+        )
+        self.assertEqual(
+            list(MediaFile.objects.values_list('name', 'refcount')),
+            [(name, 1)],
+        )
+
+    def test_gc_removes_only_old_orphans(self):
+        post = Post.objects.create(
+            text=TEXT_FOR_TEST, author=self.USER, image=image_file((3, 3, 3))
+        )
+        kept = thumbnails.thumbnail_name(post.image.name, 'feed')
+        orphan = 'posts/00/00/' + '0' * 64 + '.png'
+        young_orphan = 'posts/ff/ff/' + 'f' * 64 + '.png'
+        self.write(orphan)
+        self.write(thumbnails.thumbnail_name(orphan, 'feed'))
+        self.write('thumbnails/feed/ab/legacy.jpg')
+        self.write(young_orphan, age=0)
+        call_command(
+            'gc_media', batch_size=2, checkpoint=self.checkpoint,
+            stdout=StringIO(),
+        )
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertTrue(default_storage.exists(kept))
+        self.assertTrue(default_storage.exists(young_orphan))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(
+            default_storage.exists(thumbnails.thumbnail_name(orphan, 'feed'))
+        )
+        self.assertFalse(
+            default_storage.exists('thumbnails/feed/ab/legacy.jpg')
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_gc_resumes_from_checkpoint(self):
+        first = 'posts/00/00/' + '0' * 64 + '.png'
+        second = 'posts/11/11/' + '1' * 64 + '.png'
+        self.write(first)
+        self.write(second)
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write(first)
+        scanned, deleted = media.collect_garbage(
+            batch_size=1, checkpoint=self.checkpoint
+        )
+        self.assertTrue(default_storage.exists(first))
+        self.assertFalse(default_storage.exists(second))
+        self.assertGreaterEqual(scanned, deleted)
+        default_storage.delete(first)
+
+    def test_gc_dry_run_ignores_checkpoint(self):
+        first = 'posts/00/00/' + '0' * 64 + '.png'
+        second = 'posts/11/11/' + '1' * 64 + '.png'
+        self.write(first)
+        self.write(second)
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write(first)
+        scanned, deleted = media.collect_garbage(
+            batch_size=1, dry_run=True, checkpoint=self.checkpoint
+        )
+        self.assertEqual((scanned, deleted), (2, 2))
+        with open(self.checkpoint) as checkpoint:
+            self.assertEqual(checkpoint.read(), first)
+        self.assertTrue(default_storage.exists(first))
+        self.assertTrue(default_storage.exists(second))
+        default_storage.delete(first)
+        default_storage.delete(second)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+@mock.patch('posts.media.transaction.on_commit', run_on_commit)
+class MediaViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text=TEXT_FOR_TEST,
+            author=self.USER,
+            image=image_file((40, 50, 60)),
+        )
+        self.name = self.post.image.name
+        with default_storage.open(self.name) as original:
+            self.content = original.read()
+
+    def get(self, name, **headers):
+        response = self.client.get(
+            reverse('posts:media', kwargs={'name': name}), **headers
+        )
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def test_serves_original_and_derived_files(self):
+        response = self.get(self.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_bytes, self.content)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        thumbnails.generate(self.post.pk, self.name)
+        thumbnail = self.get(thumbnails.thumbnail_name(self.name, 'feed'))
+        self.assertEqual(thumbnail.status_code, 200)
+        self.assertNotIn('immutable', thumbnail['Cache-Control'])
+
+    def test_range_and_if_none_match(self):
+        response = self.get(self.name, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, self.content[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        etag = self.get(self.name)['ETag']
+        self.assertEqual(
+            self.get(self.name, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        stale = self.get(
+            self.name, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(stale.status_code, 200)
+
+    def test_unreferenced_files_are_not_served(self):
+        orphan = default_storage.save(
+            'posts/orphan.png', image_file((1, 1, 1))
+        )
+        names = [orphan, 'posts/../../manage.py', 'cache/file.jpg']
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        self.post.delete()
+        self.assertEqual(self.get(self.name).status_code, 404)
+
+    def test_offloads_transfer_to_front_server(self):
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.get(self.name)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(
+            self.name
+        ))
+        self.assertEqual(response.content, b'')
+        with self.settings(
+            MEDIA_SENDFILE='x-accel-redirect',
+            MEDIA_ACCEL_PREFIX='/protected-media/',
+        ):
+            response = self.get(self.name)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.name}'
+        )
+        self.assertEqual(response['Content-Type'], 'image/png')
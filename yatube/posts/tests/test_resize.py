@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, Client, override_settings
+from PIL import Image
+
+from .. import resize
+from ..models import MediaFile, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+def image_file(size=(1200, 800), color=(30, 120, 200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResizeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        self.post = Post.objects.create(
+            text=TEXT_FOR_TEST, author=self.USER, image=image_file()
+        )
+        self.url = resize.resized_url(self.post.image.name, 300, 200)
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def test_first_request_resizes_and_stores_file(self):
+        response = self.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        with Image.open(BytesIO(response.content_bytes)) as image:
+            self.assertEqual(image.size, (300, 200))
+        self.assertTrue(default_storage.exists(
+            resize.resized_name(self.post.image.name, 300, 200)
+        ))
+
+    def test_next_requests_read_stored_file(self):
+        full = self.get(self.url)
+        with mock.patch('posts.resize._render') as render:
+            response = self.get(self.url, HTTP_RANGE='bytes=0-9')
+            not_modified = self.get(
+                self.url, HTTP_IF_NONE_MATCH=full['ETag']
+            )
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, full.content_bytes[:10])
+        self.assertEqual(
+            response['Content-Range'],
+            f'bytes 0-9/{len(full.content_bytes)}'
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(self.url, HTTP_RANGE='bytes=999999-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_rejects_bad_signature_and_size(self):
+        name = self.post.image.name
+        urls = [
+            self.url.replace('/300x200/', '/301x200/'),
+            resize.resized_url(name, resize.MAX_SIDE + 1, 100),
+            resize.resized_url('posts/missing.png', 300, 200),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 404)
+
+    def test_rejects_image_no_post_refers_to(self):
+        name = self.post.image.name
+        Post.objects.filter(pk=self.post.pk).update(image='')
+        MediaFile.objects.filter(name=name).delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self.get(self.url).status_code, 404)
+        self.assertFalse(default_storage.exists(
+            resize.resized_name(name, 300, 200)
+        ))
+
+    def test_waits_for_locked_key_then_resizes(self):
+        cache.add(
+            resize.LOCK_KEY.format(
+                '300x200', resize._digest(self.post.image.name)
+            ),
+            1,
+        )
+        with mock.patch('posts.resize.WAIT', 0):
+            self.assertEqual(self.get(self.url).status_code, 200)
+
+    def test_template_tag(self):
+        template = Template(
+            '{% load post_images %}{% resized post.image 300 200 %}'
+        )
+        self.assertEqual(
+            template.render(Context({'post': self.post})), self.url
+        )
+
+    def test_post_delete_removes_resized_file(self):
+        self.get(self.url)
+        path = default_storage.path(
+            resize.resized_name(self.post.image.name, 300, 200)
+        )
+        with mock.patch('posts.media.transaction.on_commit', run_on_commit):
+            self.post.delete()
+        self.assertFalse(os.path.exists(path))
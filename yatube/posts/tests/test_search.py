@@ -0,0 +1,135 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, User
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 есть только в SQLite')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+        cls.OTHER = User.objects.create_user(username='other_author')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def found(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return [post.pk for post in response.context.get('page_obj', [])]
+
+    def test_finds_word_prefixes_ranked_by_bm25(self):
+        once = Post.objects.create(
+            text='Котики и собаки', author=self.USER
+        )
+        twice = Post.objects.create(
+            text='Котики, котики и ещё раз котики', author=self.USER
+        )
+        Post.objects.create(text='Только собаки', author=self.USER)
+        self.assertEqual(self.found('КОТ'), [twice.pk, once.pk])
+        self.assertEqual(self.found('кот собак'), [once.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        Post.objects.create(text='Обычный пост', author=self.USER)
+        for query in ('"', 'AND OR NOT', '*', 'text:пост', '(пост'):
+            with self.subTest(query=query):
+                response = self.guest_client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Старый текст', author=self.USER)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        self.assertEqual(self.found('новый'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('новый'), [])
+
+    def test_facets_and_filters(self):
+        group = Group.objects.create(title='Кино', slug='cinema')
+        grouped = Post.objects.create(
+            text='Пост про кино', author=self.USER, group=group
+        )
+        other = Post.objects.create(text='Тоже про кино', author=self.OTHER)
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'кино'}
+        )
+        self.assertEqual(
+            response.context['authors'], [(self.USER, 1), (self.OTHER, 1)]
+        )
+        self.assertEqual(response.context['groups'], [(group, 1)])
+        self.assertEqual(
+            self.found('кино', author=self.OTHER.pk), [other.pk]
+        )
+        self.assertEqual(self.found('кино', group=group.pk), [grouped.pk])
+        group_pk = group.pk
+        group.delete()
+        self.assertEqual(self.found('кино', group=group_pk), [])
+
+    def test_keyset_pagination(self):
+        posts = [
+            Post.objects.create(text=f'Поиск {i}', author=self.USER)
+            for i in range(25)
+        ]
+        pages = []
+        cursor = None
+        while True:
+            params = {'q': 'поиск'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.guest_client.get(reverse('posts:search'), params)
+            page_obj = response.context['page_obj']
+            pages.append([post.pk for post in page_obj])
+            cursor = page_obj.paginator.next_cursor
+            if not cursor:
+                break
+            self.assertContains(response, 'q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA&')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertCountEqual(sum(pages, []), [post.pk for post in posts])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        post = Post.objects.create(text='Редкое слово', author=self.USER)
+        Post.objects.create(text='Другой пост', author=self.USER)
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'редк'}
+            )
+        self.assertEqual(
+            [row.pk for row in response.context['cl'].result_list], [post.pk]
+        )
+        self.assertTrue(any(
+            search.TABLE in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(text='Переиндексация', author=self.USER)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+            cursor.execute(
+                f"INSERT INTO {search.TABLE} (rowid, text) "
+                "VALUES (999999, 'переиндексация')"
+            )
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.found('переиндексация'), [post.pk])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchone()[0], Post.objects.count())
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import similar
+from ..models import Post, SimilarPost, User
+
+MODEL_DIR = tempfile.mkdtemp()
+MODEL_PATH = os.path.join(MODEL_DIR, 'similar_posts.npz')
+
+TEXTS = (
+    'Борщ — это свёкла, капуста и лук',
+    'Главное в борще? Свёкла и капуста',
+    'Капуста, свёкла, морковь: борщ на обед',
+    'Футбольный матч закончился вничью',
+    'Футбольный матч перенесли на субботу',
+    'Погода сегодня солнечная',
+)
+
+
+@override_settings(SIMILAR_POSTS_MODEL=MODEL_PATH)
+class SimilarPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+        if os.path.exists(MODEL_PATH):
+            os.remove(MODEL_PATH)
+        self.posts = [
+            Post.objects.create(text=text, author=self.USER)
+            for text in TEXTS
+        ]
+
+    def similar_to(self, post):
+        return list(
+            SimilarPost.objects.filter(post=post).order_by(
+                'rank'
+            ).values_list('similar', flat=True)
+        )
+
+    def build(self, **options):
+        call_command(
+            'build_similar_posts', stdout=StringIO(), top_k=2,
+            chunk_size=2, batch_size=4, **options
+        )
+
+    def test_build_finds_posts_on_same_topic(self):
+        self.build()
+        borscht = {post.pk for post in self.posts[:3]}
+        football = {post.pk for post in self.posts[3:5]}
+        for post in self.posts[:3]:
+            with self.subTest(text=post.text):
+                self.assertEqual(
+                    set(self.similar_to(post)), borscht - {post.pk}
+                )
+        self.assertEqual(self.similar_to(self.posts[3]), [self.posts[4].pk])
+        self.assertEqual(football & set(self.similar_to(self.posts[0])), set())
+        self.assertEqual(self.similar_to(self.posts[5]), [])
+
+    def test_post_detail_reads_table_with_one_query(self):
+        self.build()
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts[3].pk}
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(url)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if 'posts_similarpost' in query['sql']
+        ]
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Похожие записи')
+        self.assertContains(response, reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts[4].pk}
+        ))
+
+    def test_incremental_update_adds_new_posts(self):
+        self.build()
+        new = Post.objects.create(
+            text='Футбольный матч покажут по телевизору', author=self.USER
+        )
+        self.build(incremental=True)
+        self.assertIn(self.posts[3].pk, self.similar_to(new))
+        self.assertIn(new.pk, self.similar_to(self.posts[4]))
+        model = similar.load()
+        self.assertEqual(model.ids[-1], new.pk)
+        self.assertEqual(model.matrix.shape[0], len(self.posts) + 1)
+
+    def test_deleted_posts_are_skipped(self):
+        self.build()
+        deleted = self.posts[4].pk
+        self.posts[4].delete()
+        new = Post.objects.create(
+            text='Футбольный матч завтра', author=self.USER
+        )
+        self.build(incremental=True)
+        self.assertEqual(self.similar_to(new), [self.posts[3].pk])
+        self.assertFalse(SimilarPost.objects.filter(post=deleted).exists())
+
+    def test_long_tokens_are_not_terms(self):
+        blob = 'x' * (similar.MAX_TERM_LENGTH + 1)
+        self.assertEqual(
+            similar.tokenize(f'борщ {blob} матч'), ['борщ', 'матч']
+        )
+        for text in (f'Ссылка {blob}', f'Ещё раз {blob}'):
+            Post.objects.create(text=text, author=self.USER)
+        self.build()
+        terms = similar.load().terms
+        self.assertNotIn(blob, terms.tolist())
+        self.assertLessEqual(
+            terms.dtype.itemsize, 4 * similar.MAX_TERM_LENGTH
+        )
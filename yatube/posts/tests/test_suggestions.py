@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, User
+
+
+class FollowSuggestionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'alice', 'bob', 'carol', 'dave', 'twin', 'gina')
+        cls.USERS = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.USERS['reader'])
+        for user, author in (
+            ('reader', 'alice'), ('reader', 'bob'),
+            ('alice', 'carol'), ('bob', 'carol'), ('alice', 'dave'),
+            ('twin', 'alice'), ('twin', 'bob'), ('twin', 'gina'),
+        ):
+            Follow.objects.create(
+                user=self.USERS[user], author=self.USERS[author]
+            )
+
+    def build(self):
+        call_command(
+            'build_follow_suggestions', stdout=StringIO(), chunk_size=2,
+            batch_size=3,
+        )
+
+    def suggested_to(self, name):
+        return list(
+            FollowSuggestion.objects.filter(
+                user=self.USERS[name]
+            ).order_by('rank').values_list('suggested__username', flat=True)
+        )
+
+    def test_build_ranks_friends_of_friends_then_co_follows(self):
+        self.build()
+        self.assertEqual(
+            self.suggested_to('reader'), ['carol', 'dave', 'gina']
+        )
+        self.assertEqual(self.suggested_to('carol'), [])
+
+    def test_following_suggested_author_removes_suggestion(self):
+        self.build()
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=('carol',))
+        )
+        self.assertEqual(self.suggested_to('reader'), ['dave', 'gina'])
+
+    def test_rebuild_drops_stale_and_inactive_users(self):
+        self.build()
+        gina = self.USERS['gina']
+        gina.is_active = False
+        gina.save()
+        self.build()
+        self.assertEqual(self.suggested_to('reader'), ['carol', 'dave'])
+        Follow.objects.filter(user=self.USERS['reader']).delete()
+        self.build()
+        self.assertEqual(self.suggested_to('reader'), [])
+
+    def test_profile_shows_suggestions_except_its_author(self):
+        self.build()
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=('carol',))
+        )
+        self.assertEqual(
+            [entry.suggested.username
+             for entry in response.context['suggestions']],
+            ['dave', 'gina'],
+        )
+        self.assertContains(response, 'Кого почитать')
+
+    def test_follow_page_reads_table_with_one_query(self):
+        self.build()
+        url = reverse('posts:follow_index')
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if 'posts_followsuggestion' in query['sql']
+        ]
+        self.assertEqual(len(queries), 1)
+        self.assertContains(
+            response, reverse('posts:profile', args=('carol',))
+        )
+
+    def test_new_suggestions_change_page_etag(self):
+        url = reverse('posts:follow_index')
+        etag = self.authorized_client.get(url)['ETag']
+        self.build()
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
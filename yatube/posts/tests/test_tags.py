@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import tags
+from ..models import Follow, Post, PostTag, User
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+        cache.clear()
+
+    def post_tags(self, post):
+        return set(
+            PostTag.objects.filter(post=post).values_list('tag', flat=True)
+        )
+
+    def test_extract(self):
+        cases = {
+            '#Django и #python, снова #django': ['django', 'python'],
+            'Пост про #кино.': ['кино'],
+            'почта a#b, &#39; и ##двойной': [],
+            'без тегов': [],
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(tags.extract(text), expected)
+
+    def test_create_and_edit_sync_tags(self):
+        self.authorized_test_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Про #Django и #python'},
+        )
+        post = Post.objects.get(author=self.USER)
+        self.assertEqual(self.post_tags(post), {'django', 'python'})
+        self.authorized_test_author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Только #python и #sql'},
+        )
+        self.assertEqual(self.post_tags(post), {'python', 'sql'})
+        entry = PostTag.objects.get(post=post, tag='sql')
+        self.assertEqual(entry.pub_date, post.pub_date)
+
+    def test_tag_feed_uses_cursor_pagination(self):
+        posts = [
+            Post.objects.create(text=f'Пост {i} #лента', author=self.USER)
+            for i in range(15)
+        ]
+        Post.objects.create(text='Пост без тега', author=self.USER)
+        url = reverse('posts:tag_posts', kwargs={'name': 'Лента'})
+        response = self.authorized_test_author.get(url)
+        self.assertTemplateUsed(response, 'posts/group_list.html')
+        self.assertContains(response, '#лента</h1>')
+        page_obj = response.context['page_obj']
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual([post.pk for post in page_obj], expected[:10])
+        response = self.authorized_test_author.get(
+            url, {'cursor': page_obj.paginator.next_cursor}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], expected[10:]
+        )
+
+    def test_tag_feed_reads_index(self):
+        Post.objects.create(text='#индекс', author=self.USER)
+        url = reverse('posts:tag_posts', kwargs={'name': 'индекс'})
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_test_author.get(url)
+        sql = next(
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_posttag"' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('post_tag_pub_date_idx', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_invalid_tag_is_not_found(self):
+        response = self.authorized_test_author.get(
+            reverse('posts:tag_posts', kwargs={'name': 'a-b'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_text_links_tags(self):
+        post = Post.objects.create(
+            text="It's a #Test <b>", author=self.USER
+        )
+        response = self.authorized_test_author.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        url = reverse('posts:tag_posts', kwargs={'name': 'test'})
+        self.assertContains(response, f'<a href="{url}">#Test</a>')
+        self.assertContains(response, '&lt;b&gt;')
+        self.assertNotContains(response, 'tag/39/')
+
+    def test_follow_feed_links_tags(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.USER)
+        Post.objects.create(text='Пост про #Django', author=self.USER)
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:follow_index'))
+        url = reverse('posts:tag_posts', kwargs={'name': 'django'})
+        self.assertContains(response, f'<a href="{url}">#Django</a>')
@@ -0,0 +1,342 @@
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image, features
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEXT_FOR_TEST = 'Тестовый текст'
+POSTS_ON_PAGE = 10
+
+
+def image_file(name='image.png', size=(1200, 800), color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+        cache.clear()
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    def create_post(self, color=(200, 30, 30)):
+        self.authorized_test_author.post(
+            reverse('posts:post_create'),
+            data={'text': TEXT_FOR_TEST, 'image': image_file(color=color)},
+        )
+        return Post.objects.get(author=self.USER)
+
+    def test_upload_generates_every_geometry(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        for geometry, size in thumbnails.GEOMETRIES.items():
+            with self.subTest(geometry=geometry):
+                name = thumbnails.thumbnail_name(post.image.name, geometry)
+                with default_storage.open(name) as thumbnail:
+                    self.assertEqual(Image.open(thumbnail).size, size)
+        response = self.authorized_test_author.get(reverse('posts:main_page'))
+        thumbnail = thumbnails.lookup(post.image)
+        self.assertContains(response, thumbnail.url)
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_upload_generates_responsive_variants(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        post.refresh_from_db()
+        variants = json.loads(post.image_variants)
+        self.assertEqual(list(variants), [
+            mime_type
+            for mime_type, image_format, _ in thumbnails.VARIANT_FORMATS
+            if image_format == 'JPEG' or features.check(image_format.lower())
+        ])
+        for mime_type, entries in variants.items():
+            self.assertEqual(
+                [width for _, width, _ in entries],
+                list(thumbnails.VARIANT_WIDTHS),
+            )
+            for name, width, height in entries:
+                with default_storage.open(name) as variant:
+                    image = Image.open(variant)
+                    self.assertEqual(image.size, (width, height))
+                    self.assertEqual(image.get_format_mimetype(), mime_type)
+        response = self.authorized_test_author.get(reverse('posts:main_page'))
+        for mime_type in variants:
+            if mime_type != 'image/jpeg':
+                self.assertContains(response, f'<source type="{mime_type}"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(
+            response, thumbnails.variant_name(post.image.name, 320, 'JPEG')
+        )
+
+    def test_page_shows_placeholder_until_ready(self):
+        # Цвет отличается от других тестов: одинаковые картинки делят
+        # файл и миниатюры.
+        post = self.create_post(color=(30, 30, 200))
+        with mock.patch('posts.thumbnails.Image.open') as image_open:
+            response = self.authorized_test_author.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+        image_open.assert_not_called()
+        self.assertContains(response, 'aspect-ratio')
+        self.assertIsNone(thumbnails.lookup(post.image))
+
+    def test_ready_mark_restored_from_storage(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        cache.clear()
+        self.assertIsNotNone(thumbnails.lookup(post.image))
+
+    def test_edit_without_new_image_does_not_enqueue(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+            with mock.patch('posts.thumbnails.enqueue') as enqueue:
+                self.authorized_test_author.post(
+                    reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                    data={'text': 'Новый текст'},
+                )
+        enqueue.assert_not_called()
+
+    def create_processed_posts(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            for i in range(POSTS_ON_PAGE):
+                Post.objects.create(
+                    text=TEXT_FOR_TEST,
+                    author=self.USER,
+                    image=image_file(
+                        f'image_{i}.png', size=(40, 20), color=(i, 0, 0)
+                    ),
+                )
+
+    def get_main_page_counting_io(self):
+        """Главная страница с подсчётом обращений к кешу и файлам."""
+        with mock.patch(
+            'posts.thumbnails.cache', wraps=cache
+        ) as counted, mock.patch(
+            'django.core.files.storage.FileSystemStorage.exists'
+        ) as exists, mock.patch(
+            'django.core.files.storage.FileSystemStorage.open'
+        ) as open_file:
+            response = self.authorized_test_author.get(
+                reverse('posts:main_page')
+            )
+        open_file.assert_not_called()
+        self.assertContains(
+            response, 'width="960" height="339"', count=POSTS_ON_PAGE
+        )
+        return counted, exists
+
+    def test_feed_of_processed_posts_does_no_image_io(self):
+        self.create_processed_posts()
+        counted, exists = self.get_main_page_counting_io()
+        counted.get_many.assert_not_called()
+        counted.get.assert_not_called()
+        exists.assert_not_called()
+
+    def test_feed_resolves_thumbnails_with_one_cache_call(self):
+        self.create_processed_posts()
+        # Посты, обработанные до появления image_variants.
+        Post.objects.update(image_variants='')
+        counted, exists = self.get_main_page_counting_io()
+        self.assertEqual(counted.get_many.call_count, 1)
+        counted.get.assert_not_called()
+        exists.assert_not_called()
+
+    def test_upload_fills_image_meta(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertEqual(post.image_color, '#c81e1e')
+        created = Post.objects.create(
+            text=TEXT_FOR_TEST,
+            author=self.USER,
+            image=image_file(size=(30, 20), color=(1, 2, 3)),
+        )
+        self.assertEqual((created.image_width, created.image_height), (30, 20))
+
+    def test_loading_post_does_not_open_image(self):
+        post = Post.objects.create(text=TEXT_FOR_TEST, author=self.USER)
+        Post.objects.filter(pk=post.pk).update(image='posts/missing.png')
+        with mock.patch(
+            'django.core.files.storage.FileSystemStorage.open'
+        ) as open_file:
+            post = Post.objects.get(pk=post.pk)
+        open_file.assert_not_called()
+        self.assertIsNone(post.image_width)
+
+    def test_backfill_image_meta(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        Post.objects.update(
+            image_width=None, image_height=None, image_color=''
+        )
+        missing = Post.objects.create(text=TEXT_FOR_TEST, author=self.USER)
+        Post.objects.filter(pk=missing.pk).update(image='posts/missing.png')
+        stderr = StringIO()
+        call_command(
+            'backfill_image_meta', workers=1, batch_size=1,
+            stdout=StringIO(), stderr=stderr,
+        )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertEqual(post.image_color, '#c81e1e')
+        self.assertIn('posts/missing.png', stderr.getvalue())
+
+    def generate_thumbnails(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'generate_thumbnails', workers=0, checkpoint=self.checkpoint,
+            stdout=stdout, stderr=stderr, **options
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_generate_thumbnails_fills_missing(self):
+        post = self.create_post(color=(30, 200, 30))
+        missing = Post.objects.create(text=TEXT_FOR_TEST, author=self.USER)
+        Post.objects.filter(pk=missing.pk).update(image='posts/missing.png')
+        stdout, stderr = self.generate_thumbnails(batch_size=1)
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.lookup(post.image))
+        self.assertTrue(post.image_variants)
+        self.assertIn('posts/missing.png', stderr)
+        self.assertIn('ошибок: 1', stdout)
+        self.assertIn('изобр./с', stdout)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_generate_thumbnails_resumes_from_checkpoint(self):
+        posts = [
+            self.create_post(color=(200, 200, 30)),
+            Post.objects.create(
+                text=TEXT_FOR_TEST,
+                author=self.USER,
+                image=image_file(color=(30, 200, 200)),
+            ),
+        ]
+        first, second = sorted(post.image.name for post in posts)
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write(first)
+        self.generate_thumbnails()
+        self.assertFalse(Post.objects.get(image=first).image_variants)
+        self.assertTrue(Post.objects.get(image=second).image_variants)
+
+    @override_settings(BASE_DIR=TEMP_MEDIA_ROOT)
+    def test_generate_thumbnails_keeps_checkpoint_per_mode(self):
+        post = self.create_post(color=(200, 30, 200))
+        stopped_all = os.path.join(
+            TEMP_MEDIA_ROOT, 'generate_thumbnails.all.checkpoint'
+        )
+        with open(stopped_all, 'w') as checkpoint:
+            checkpoint.write(post.image.name)
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.image_variants)
+        self.assertTrue(os.path.exists(stopped_all))
+        self.assertFalse(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, 'generate_thumbnails.missing.checkpoint'
+        )))
+
+    def test_generate_thumbnails_all_redoes_ready_images(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            post = self.create_post()
+        command = 'posts.management.commands.generate_thumbnails'
+        with mock.patch(f'{command}.generate') as generate:
+            self.generate_thumbnails()
+            generate.assert_not_called()
+            self.generate_thumbnails(all=True)
+        generate.assert_called_once_with(post.pk, post.image.name)
+
+    def test_generate_thumbnails_uses_process_pool(self):
+        Post.objects.create(
+            text=TEXT_FOR_TEST, author=self.USER, image=image_file()
+        )
+        command = 'posts.management.commands.generate_thumbnails'
+        with mock.patch(f'{command}.ProcessPoolExecutor') as executor:
+            executor.return_value.map.return_value = [None]
+            call_command(
+                'generate_thumbnails', workers=2, checkpoint=self.checkpoint,
+                stdout=StringIO(),
+            )
+        executor.assert_called_once()
+        self.assertEqual(executor.call_args[1]['max_workers'], 2)
+        executor.return_value.shutdown.assert_called_once()
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_enqueue_uses_process_pool(self):
+        with mock.patch('posts.thumbnails._get_pool') as get_pool:
+            thumbnails.enqueue(1, 'posts/image.png')
+        get_pool.return_value.submit.assert_called_once_with(
+            thumbnails._generate_logged, 1, 'posts/image.png'
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_enqueue_resubmits_job_after_pool_broke(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        fresh = mock.Mock()
+        with mock.patch(
+            'posts.thumbnails._get_pool', side_effect=[broken, fresh]
+        ), self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.enqueue(1, 'posts/image.png')
+        fresh.submit.assert_called_once_with(
+            thumbnails._generate_logged, 1, 'posts/image.png'
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_enqueue_runs_job_inline_if_new_pool_broke_too(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        with mock.patch(
+            'posts.thumbnails._get_pool', return_value=broken
+        ), mock.patch(
+            'posts.thumbnails._generate_logged'
+        ) as generate, self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.enqueue(1, 'posts/image.png')
+        generate.assert_called_once_with(1, 'posts/image.png')
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.cache import cache
+
+from ..models import Follow, Post, TimelineEntry, User
+
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.AUTHOR = User.objects.create_user(username='test_author')
+        cls.READER = User.objects.create_user(username='reader')
+        cls.OLD_POST = Post.objects.create(
+            text=TEXT_FOR_TEST,
+            author=cls.AUTHOR,
+        )
+
+    def setUp(self):
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.READER)
+        cache.clear()
+
+    def follow(self):
+        self.authorized_reader.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.AUTHOR.username}
+            )
+        )
+
+    def feed(self):
+        response = self.authorized_reader.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.READER, post=self.OLD_POST
+            ).exists()
+        )
+        new_post = Post.objects.create(text='Новый пост', author=self.AUTHOR)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.READER, post=new_post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [new_post.pk, self.OLD_POST.pk])
+
+    def test_unfollow_prunes_timeline(self):
+        self.follow()
+        self.authorized_reader.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.AUTHOR.username}
+            )
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.READER).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    def test_celebrity_posts_are_merged_at_read(self):
+        other = User.objects.create_user(username='other_author')
+        Follow.objects.create(user=self.READER, author=other)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 0):
+            self.follow()
+            celebrity_post = Post.objects.create(
+                text='Пост знаменитости', author=self.AUTHOR
+            )
+            other_post = Post.objects.create(text='Пост', author=other)
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=celebrity_post).exists()
+            )
+            self.assertEqual(
+                self.feed(),
+                [other_post.pk, celebrity_post.pk, self.OLD_POST.pk]
+            )
+
+    def test_former_celebrity_posts_stay_in_feed(self):
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            self.follow()
+            fan = User.objects.create_user(username='fan')
+            Follow.objects.create(user=fan, author=self.AUTHOR)
+            celebrity_post = Post.objects.create(
+                text='Пост знаменитости', author=self.AUTHOR
+            )
+            Follow.objects.filter(user=fan).delete()
+            self.assertEqual(
+                self.feed(), [celebrity_post.pk, self.OLD_POST.pk]
+            )
+        late_reader = User.objects.create_user(username='late_reader')
+        Follow.objects.create(user=late_reader, author=self.AUTHOR)
+        client = Client()
+        client.force_login(late_reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [celebrity_post.pk, self.OLD_POST.pk],
+        )
@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+
+from core.uploadhandlers import BoundedTemporaryFileUploadHandler
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEXT_FOR_TEST = 'Тестовый текст'
+
+
+def image_file(size, image_format='PNG', name='image.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (30, 200, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+
+    def create_post(self, image):
+        return self.authorized_test_author.post(
+            reverse('posts:post_create'),
+            data={'text': TEXT_FOR_TEST, 'image': image},
+        )
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=1024)
+    def test_oversized_file_rejected(self):
+        response = self.create_post(image_file((400, 400), 'BMP'))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1,0\xa0КБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected_before_decoding(self):
+        with mock.patch.object(
+            ImageFile.ImageFile, 'load', autospec=True
+        ) as load:
+            response = self.create_post(image_file((40, 40)))
+        load.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка 40×40 слишком большая.'
+        )
+
+    def test_unsupported_format_rejected(self):
+        response = self.create_post(image_file((10, 10), 'BMP', 'image.bmp'))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Поддерживаются только JPEG, PNG, GIF и WebP.'
+        )
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=100)
+    def test_handler_writes_at_most_limit(self):
+        handler = BoundedTemporaryFileUploadHandler()
+        handler.new_file('image', 'image.png', 'image/png', 250)
+        for start in range(0, 250, 50):
+            handler.receive_data_chunk(b'x' * 50, start)
+        upload = handler.file_complete(250)
+        self.assertEqual(upload.size, 250)
+        upload.seek(0)
+        self.assertEqual(len(upload.read()), 101)
+        upload.close()
+
+    def test_truncated_upload_rejected_by_admin_form(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x'
+        )
+        client = Client()
+        client.force_login(admin)
+        buffer = BytesIO()
+        Image.new('RGB', (400, 400)).save(buffer, 'JPEG')
+        limit = len(buffer.getvalue()) // 2
+        upload = SimpleUploadedFile(
+            'image.jpg', buffer.getvalue(), 'image/jpeg'
+        )
+        with override_settings(FILE_UPLOAD_MAX_SIZE=limit):
+            response = client.post(
+                reverse('admin:posts_post_add'),
+                data={'text': TEXT_FOR_TEST, 'author': self.USER.pk,
+                      'image': upload},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image', response.context['adminform'].form.errors)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_DOWNSCALE_SIDE=500)
+    def test_original_downscaled_in_worker(self):
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ):
+            self.create_post(image_file((1200, 800)))
+        post = Post.objects.get()
+        with default_storage.open(post.image.name) as original:
+            self.assertEqual(Image.open(original).size, (500, 333))
@@ -1,14 +1,21 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
-from django.urls import reverse
+from django.urls import resolve, reverse
 from django import forms
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from PIL import Image
 
-from ..models import Follow, Post, Group, User
+from ..models import Comment, Follow, Post, Group, User
+from ..paginators import LIMIT_OF_POSTS, CursorPaginator
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 TITLE_FOR_TEST = 'Тестовая группа'
@@ -119,6 +126,171 @@ class PaginatorTests(TestCase):
                 )
 
 
+class CursorPaginatorTests(TestCase):
+    SUM_POSTS = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_user(username='test1_author')
+        for i in range(CursorPaginatorTests.SUM_POSTS):
+            Post.objects.create(
+                text=f'{TEXT_FOR_TEST} {i}',
+                author=cls.USER,
+            )
+        # Одинаковое время публикации: порядок должен держаться на id.
+        Post.objects.filter(pk__lte=12).update(
+            pub_date=Post.objects.get(pk=1).pub_date
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def walk(self, url):
+        seen = []
+        cursor = ''
+        while True:
+            response = self.guest_client.get(url, {'cursor': cursor})
+            page_obj = response.context['page_obj']
+            seen.append([post.pk for post in page_obj])
+            if not page_obj.has_next():
+                return seen, page_obj
+            cursor = page_obj.paginator.next_cursor
+
+    def test_next_cursors_cover_feed_without_gaps(self):
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        pages, _ = self.walk(reverse('posts:main_page'))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        url = reverse('posts:main_page')
+        pages, last_page = self.walk(url)
+        response = self.guest_client.get(
+            url, {'cursor': last_page.paginator.previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.pk for post in page_obj], pages[-2])
+        self.assertTrue(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+
+    def test_deep_page_has_constant_query_count(self):
+        url = reverse(
+            'posts:profile', kwargs={'username': self.USER.username}
+        )
+        _, last_page = self.walk(url)
+        cursor = last_page.paginator.cursor
+        with self.assertNumQueries(1):
+            CursorPaginator(Post.objects.all(), 10).get_page(cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:main_page'), {'cursor': 'broken!'}
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+def run_on_commit(func):
+    func()
+
+
+def image_file(shade):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), (shade, 100, 100)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        f'image{shade}.png', buffer.getvalue(), 'image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class QueryBudgetTests(TestCase):
+    SUM_POSTS = LIMIT_OF_POSTS + 1
+    SUM_COMMENTS = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.USER = User.objects.create_superuser(
+            username='test_author', email='author@test.ru', password='pass'
+        )
+        cls.AUTHOR = User.objects.create_user(username='author')
+        cls.GROUP = Group.objects.create(
+            title=TITLE_FOR_TEST,
+            slug=SLUG_FOR_TEST,
+            description=DESCRIPTION_FOR_TEST,
+        )
+        Follow.objects.create(user=cls.USER, author=cls.AUTHOR)
+        # Миниатюры готовятся сразу, как после работы пула.
+        with mock.patch(
+            'posts.signals.transaction.on_commit', run_on_commit
+        ), mock.patch('posts.media.transaction.on_commit', run_on_commit):
+            for i in range(QueryBudgetTests.SUM_POSTS):
+                cls.POST = Post.objects.create(
+                    text=f'{TEXT_FOR_TEST} {i}',
+                    author=cls.AUTHOR,
+                    group=cls.GROUP,
+                    image=image_file(i),
+                )
+        for i in range(QueryBudgetTests.SUM_COMMENTS):
+            cls.COMMENT = Comment.objects.create(
+                post=cls.POST,
+                author=User.objects.create_user(username=f'reader_{i}'),
+                text=TEXT_FOR_TEST,
+            )
+        cls.PAGES_NAMES = [
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': cls.GROUP.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': cls.AUTHOR.username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': cls.POST.pk}),
+            reverse('posts:follow_index'),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_test_author = Client()
+        self.authorized_test_author.force_login(self.USER)
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_test_author.get(url)
+        return len(context)
+
+    def test_views_fit_query_budget(self):
+        for page in self.PAGES_NAMES:
+            with self.subTest(page=page):
+                budget = resolve(page).func.query_budget
+                self.assertLessEqual(self.count_queries(page), budget)
+
+    def test_views_do_not_grow_with_rows(self):
+        full_pages = {
+            page: self.count_queries(page) for page in self.PAGES_NAMES
+        }
+        Post.objects.exclude(pk=self.POST.pk).delete()
+        Comment.objects.exclude(pk=self.COMMENT.pk).delete()
+        cache.clear()
+        for page in self.PAGES_NAMES:
+            with self.subTest(page=page):
+                self.assertEqual(self.count_queries(page), full_pages[page])
+
+    def test_admin_changelist_does_not_grow_with_rows(self):
+        url = reverse('admin:posts_post_changelist')
+        full_page = self.count_queries(url)
+        Post.objects.exclude(pk=self.POST.pk).delete()
+        self.assertEqual(self.count_queries(url), full_page)
+
+
 class ContextPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -314,6 +486,8 @@ class ContextTestsPicture(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        digest = hashlib.sha256(small_gif).hexdigest()
+        cls.IMAGE_NAME = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         uploaded = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -347,7 +521,7 @@ class ContextTestsPicture(TestCase):
             reverse('posts:main_page')
         )
         post_object = response.context['page_obj']
-        self.assertEqual(post_object[0].image, 'posts/small.gif')
+        self.assertEqual(post_object[0].image, self.IMAGE_NAME)
 
     def test_context_group_list(self):
         response = self.authorized_test_author.get(
@@ -356,7 +530,7 @@ class ContextTestsPicture(TestCase):
                     )
         )
         group_object = response.context['page_obj']
-        self.assertEqual(group_object[0].image, 'posts/small.gif')
+        self.assertEqual(group_object[0].image, self.IMAGE_NAME)
 
     def test_profile_context_picture(self):
         response = self.authorized_test_author.get(
@@ -365,7 +539,7 @@ class ContextTestsPicture(TestCase):
                     )
         )
         post_object = response.context['page_obj']
-        self.assertEqual(post_object[0].image, 'posts/small.gif')
+        self.assertEqual(post_object[0].image, self.IMAGE_NAME)
         author_object = response.context['author']
         self.assertEqual(author_object.username, 'test_author')
 
@@ -376,7 +550,7 @@ class ContextTestsPicture(TestCase):
                     )
         )
         post_object = response.context['post']
-        self.assertEqual(post_object.image, 'posts/small.gif')
+        self.assertEqual(post_object.image, self.IMAGE_NAME)
 
 
 class CommentTests(TestCase):
@@ -0,0 +1,378 @@
+"""Миниатюры картинок постов.
+
+Миниатюры всех размеров из GEOMETRIES готовятся после загрузки картинки
+в пуле процессов. Шаблоны только проверяют, готова ли миниатюра, и до
+её появления показывают заглушку, поэтому запрос страницы никогда не
+декодирует оригинал.
+
+Готовность отмечается в общем кеше. Если отметку вытеснили, её
+восстанавливает проверка файла в хранилище. Имя файла миниатюры
+однозначно определяется именем оригинала и размером.
+
+Производные файлы лежат в каталоге thumbnails/<имя оригинала>/: так они
+наследуют шардирование оригинала, а сборщик мусора по пути файла сразу
+знает, к какому оригиналу он относится.
+
+Там же готовятся варианты для srcset: несколько ширин в AVIF, WebP и JPEG.
+Их список сохраняется в Post.image_variants и читается вместе с постом.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import cache_versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+GEOMETRIES = {
+    'feed': (960, 339),
+}
+JPEG_QUALITY = 85
+# Ширины вариантов для srcset; пропорции как у миниатюры ленты.
+VARIANT_WIDTHS = (320, 640, 960)
+# Форматы в порядке предпочтения: (MIME-тип, формат Pillow, параметры).
+VARIANT_FORMATS = (
+    ('image/avif', 'AVIF', {'quality': 50}),
+    ('image/webp', 'WEBP', {'quality': 75, 'method': 6}),
+    ('image/jpeg', 'JPEG', {
+        'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True,
+    }),
+)
+# Параметры пересохранения уменьшенных оригиналов.
+ORIGINAL_PARAMS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'WEBP': {'quality': 90},
+}
+DERIVED_ROOT = 'thumbnails'
+READY_KEY = 'thumbnail:{}:{}'
+READY_TIMEOUT = 60 * 60 * 24 * 30
+
+Thumbnail = namedtuple(
+    'Thumbnail',
+    ('url', 'width', 'height', 'srcset', 'sources'),
+    defaults=('', ()),
+)
+Source = namedtuple('Source', ('type', 'srcset'))
+
+_pool = None
+
+
+def _digest(source_name):
+    return hashlib.md5(source_name.encode()).hexdigest()
+
+
+def derived_dir(source_name):
+    return f'{DERIVED_ROOT}/{source_name}'
+
+
+def source_of(derived_name):
+    """Имя оригинала для производного файла или None."""
+    directory, _, _ = derived_name.rpartition('/')
+    prefix = DERIVED_ROOT + '/'
+    if not directory.startswith(prefix):
+        return None
+    return directory[len(prefix):]
+
+
+def thumbnail_name(source_name, geometry):
+    return f'{derived_dir(source_name)}/{geometry}.jpg'
+
+
+def variant_name(source_name, width, image_format):
+    extension = image_format.lower()
+    return f'{derived_dir(source_name)}/{width}.{extension}'
+
+
+def derived_names(source_name):
+    """Имена всех файлов, которые generate() делает из оригинала."""
+    names = [
+        thumbnail_name(source_name, geometry) for geometry in GEOMETRIES
+    ]
+    for _, image_format, _ in VARIANT_FORMATS:
+        for width in VARIANT_WIDTHS:
+            names.append(variant_name(source_name, width, image_format))
+    return names
+
+
+def stored_derived_names(source_name):
+    """Имена производных файлов оригинала, которые есть в хранилище.
+
+    Кроме файлов из derived_names() сюда попадают картинки, уменьшенные
+    по запросу (см. posts/resize.py).
+    """
+    directory = derived_dir(source_name)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [f'{directory}/{name}' for name in files]
+
+
+def ready_key(source_name, geometry):
+    return READY_KEY.format(geometry, _digest(source_name))
+
+
+def generate(post_pk, source_name):
+    """Готовит миниатюры и варианты картинки и отмечает их готовыми."""
+    downscale_side = settings.POST_IMAGE_DOWNSCALE_SIDE
+    with image_storage().open(source_name) as source:
+        image = Image.open(source)
+        image_format = image.format
+        # JPEG декодируется сразу в уменьшенном масштабе: память воркера
+        # зависит от нужного размера, а не от размера оригинала.
+        needed = max(downscale_side, *GEOMETRIES['feed'])
+        image.draft('RGB', (needed, needed))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    changes = {}
+    if downscale_side and max(image.size) > downscale_side:
+        image.thumbnail((downscale_side, downscale_side), Image.LANCZOS)
+        # Имя оригинала остаётся прежним: по нему на файл ссылаются
+        # все посты с этой картинкой.
+        image_storage().replace(source_name, _encode(
+            image, image_format, **ORIGINAL_PARAMS.get(image_format, {})
+        ))
+        changes['image_width'], changes['image_height'] = image.size
+    for geometry, size in GEOMETRIES.items():
+        # Обрезка по центру с увеличением, как crop="center" upscale=True.
+        _save(
+            thumbnail_name(source_name, geometry),
+            ImageOps.fit(image, size, Image.LANCZOS),
+            'JPEG',
+            quality=JPEG_QUALITY, optimize=True, progressive=True,
+        )
+        cache.set(ready_key(source_name, geometry), True, READY_TIMEOUT)
+    variants = _generate_variants(image, source_name)
+    # Варианты записываются последними: по ним страницы понимают, что
+    # все файлы уже готовы. Одинаковые картинки хранятся одним файлом,
+    # поэтому варианты у них общие.
+    posts = Post.objects.filter(image=source_name)
+    pks = set(posts.values_list('pk', flat=True)) | {post_pk}
+    posts.update(
+        image_variants=json.dumps(variants),
+        image_color=dominant_color(image),
+        **changes,
+    )
+    # Закешированные фрагменты и ETag с заглушкой больше не годятся.
+    for pk in pks:
+        cache_versions.bump('post', pk)
+
+
+def dominant_color(image):
+    """Самый частый из нескольких основных цветов картинки, #rrggbb."""
+    small = image.copy()
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def measure(path):
+    """Размеры и основной цвет картинки по пути к файлу."""
+    with Image.open(path) as image:
+        width, height = image.size
+        # Для цвета хватает картинки в несколько десятков пикселей.
+        image.draft('RGB', (64, 64))
+        color = dominant_color(image.convert('RGB'))
+    return width, height, color
+
+
+def _generate_variants(image, source_name):
+    """Возвращает {MIME-тип: [[имя, ширина, высота], ...]}."""
+    feed_width, feed_height = GEOMETRIES['feed']
+    variants = {}
+    for mime_type, image_format, params in VARIANT_FORMATS:
+        if image_format != 'JPEG' and not features.check(
+            image_format.lower()
+        ):
+            continue
+        variants[mime_type] = []
+        for width in VARIANT_WIDTHS:
+            height = round(width * feed_height / feed_width)
+            name = variant_name(source_name, width, image_format)
+            _save(
+                name,
+                ImageOps.fit(image, (width, height), Image.LANCZOS),
+                image_format,
+                **params,
+            )
+            variants[mime_type].append([name, width, height])
+    return variants
+
+
+def _encode(image, image_format, **params):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return ContentFile(buffer.getvalue())
+
+
+def _save(name, image, image_format, **params):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, _encode(image, image_format, **params))
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def _generate_logged(post_pk, source_name):
+    try:
+        generate(post_pk, source_name)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', source_name)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: дочерний процесс не должен наследовать
+        # соединения с базой и кешем веб-процесса.
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _pool
+
+
+def enqueue(post_pk, source_name):
+    """Ставит подготовку миниатюр в очередь пула процессов.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры готовятся сразу в текущем процессе.
+    """
+    global _pool
+    if not settings.THUMBNAIL_WORKERS:
+        _generate_logged(post_pk, source_name)
+        return
+    try:
+        _get_pool().submit(_generate_logged, post_pk, source_name)
+        return
+    except BrokenProcessPool:
+        logger.exception('Пул миниатюр упал, он будет пересоздан')
+        _pool = None
+    # Задачу, на которой обнаружилась поломка, отдаём новому пулу, а если
+    # не вышло и с ним — готовим миниатюры здесь же, чтобы пост не остался
+    # с заглушкой до ручного запуска generate_thumbnails.
+    try:
+        _get_pool().submit(_generate_logged, post_pk, source_name)
+    except BrokenProcessPool:
+        logger.exception('Новый пул миниатюр тоже упал')
+        _pool = None
+        _generate_logged(post_pk, source_name)
+
+
+def lookup(image, geometry='feed'):
+    """Возвращает готовую миниатюру или None, пока она не подготовлена."""
+    if not image:
+        return None
+    return _find([image.name], geometry)[image.name]
+
+
+def resolve(posts, geometry='feed'):
+    """Находит миниатюры всех постов страницы.
+
+    Результат записывается в post.thumbnail: Thumbnail или None.
+    Заполненный post.image_variants означает, что все файлы готовы,
+    и такие посты не требуют ни кеша, ни файлового ввода-вывода.
+    Остальные проверяются одним запросом к кешу.
+    """
+    posts = list(posts)
+    variants = {
+        post.pk: _parse_variants(post.image_variants) for post in posts
+    }
+    found = _find({
+        post.image.name for post in posts
+        if post.image and not variants[post.pk]
+    }, geometry)
+    for post in posts:
+        post.thumbnail = None
+        if not post.image:
+            continue
+        if variants[post.pk]:
+            width, height = GEOMETRIES[geometry]
+            thumbnail = Thumbnail(
+                default_storage.url(
+                    thumbnail_name(post.image.name, geometry)
+                ),
+                width,
+                height,
+            )
+        else:
+            thumbnail = found.get(post.image.name)
+        post.thumbnail = _with_variants(thumbnail, variants[post.pk])
+    return posts
+
+
+def pending(source_names):
+    """Те из оригиналов, у которых готовы не все файлы."""
+    names = set(source_names)
+    missing = set(Post.objects.filter(
+        image__in=names, image_variants=''
+    ).values_list('image', flat=True))
+    for geometry in GEOMETRIES:
+        found = _find(names - missing, geometry)
+        missing.update(
+            name for name, thumbnail in found.items() if thumbnail is None
+        )
+    return missing
+
+
+def _parse_variants(image_variants):
+    try:
+        variants = json.loads(image_variants or '{}')
+    except ValueError:
+        return {}
+    return variants if isinstance(variants, dict) else {}
+
+
+def _with_variants(thumbnail, variants):
+    if thumbnail is None or not variants:
+        return thumbnail
+    srcsets = {
+        mime_type: ', '.join(
+            f'{default_storage.url(name)} {width}w'
+            for name, width, _ in entries
+        )
+        for mime_type, entries in variants.items()
+    }
+    return thumbnail._replace(
+        srcset=srcsets.pop('image/jpeg', ''),
+        sources=tuple(
+            Source(mime_type, srcset) for mime_type, srcset in srcsets.items()
+        ),
+    )
+
+
+def _find(source_names, geometry):
+    keys = {ready_key(name, geometry): name for name in source_names}
+    ready = cache.get_many(keys) if keys else {}
+    restored = {}
+    found = {}
+    for key, source_name in keys.items():
+        name = thumbnail_name(source_name, geometry)
+        if not ready.get(key):
+            if not default_storage.exists(name):
+                found[source_name] = None
+                continue
+            restored[key] = True
+        width, height = GEOMETRIES[geometry]
+        found[source_name] = Thumbnail(
+            default_storage.url(name), width, height
+        )
+    if restored:
+        cache.set_many(restored, READY_TIMEOUT)
+    return found
@@ -0,0 +1,125 @@
+import heapq
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .paginators import CursorPaginator, NEXT, keyset
+
+# Авторы с большим числом подписчиков не раскладывают посты по лентам:
+# их посты подмешиваются при чтении, чтобы один пост не порождал
+# лавину вставок. Признак UserCounters.fanout снимается, когда
+# подписчиков становится больше FANOUT_LIMIT, и обратно не ставится:
+# в лентах уже нет части постов такого автора, и если снова решать по
+# числу подписчиков, эти посты пропали бы из ленты.
+FANOUT_LIMIT = 1000
+BATCH_SIZE = 500
+
+
+def is_celebrity(author):
+    return UserCounters.objects.filter(user=author, fanout=False).exists()
+
+
+def mark_celebrities(authors=None):
+    """Снимает fanout у авторов, у которых подписчиков больше предела."""
+    counters = UserCounters.objects.filter(
+        fanout=True, followers_count__gt=FANOUT_LIMIT
+    )
+    if authors is not None:
+        counters = counters.filter(user__in=authors)
+    return counters.update(fanout=False)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id
+    ).values_list('user', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_celebrity(author):
+        return
+    posts = Post.objects.filter(author=author).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация по материализованной ленте пользователя.
+
+    Посты авторов без fanout в ленту попадают не все, поэтому они
+    читаются отдельно и сливаются с лентой по (pub_date, id).
+    Если задан post_fields, посты загружаются только с этими полями.
+    """
+
+    def __init__(self, user, per_page, post_fields=None, **kwargs):
+        entries = TimelineEntry.objects.filter(user=user).order_by(
+            '-pub_date', '-post'
+        )
+        super().__init__(entries, per_page, **kwargs)
+        self.user = user
+        self.post_fields = post_fields
+
+    def fetch(self, direction, pub_date=None, pk=None):
+        limit = self.per_page + 1
+        entries = keyset(
+            self.object_list, direction, pub_date, pk, id_field='post_id'
+        )
+        posts = Post.objects.all()
+        if self.post_fields:
+            entries = entries.select_related('post').only(
+                'post', *(f'post__{field}' for field in self.post_fields)
+            )
+            posts = posts.only(*self.post_fields)
+        else:
+            entries = entries.select_related('post__author', 'post__group')
+            posts = posts.select_related('author', 'group')
+        streams = [[entry.post for entry in entries[:limit]]]
+        celebrities = self.celebrities()
+        if celebrities:
+            posts = posts.filter(author__in=celebrities)
+            streams.append(
+                list(keyset(posts, direction, pub_date, pk)[:limit])
+            )
+        merged = heapq.merge(
+            *streams,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=direction == NEXT,
+        )
+        posts = []
+        seen = set()
+        for post in merged:
+            if post.pk not in seen:
+                seen.add(post.pk)
+                posts.append(post)
+        return posts[:limit]
+
+    def celebrities(self):
+        authors = Follow.objects.filter(
+            user=self.user
+        ).values_list('author', flat=True)
+        return list(
+            UserCounters.objects.filter(
+                user__in=authors, fanout=False
+            ).values_list('user', flat=True)
+        )
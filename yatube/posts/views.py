@@ -1,58 +1,168 @@
-from django.core.paginator import Paginator
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
 
+from core.decorators import query_budget
+from core.http import IMMUTABLE, serve_file
 
+from . import (
+    autocomplete as post_autocomplete, conditional, media as post_media,
+    resize, search as post_search, suggestions, tags, thumbnails,
+)
 from .models import Post, Group, User, Follow
-from .forms import PostForm, CommentForm
+from .forms import PostForm, CommentForm, SearchForm
+from .paginators import LIMIT_OF_POSTS, pagination
+from .storage import is_sharded
+from .timeline import TimelinePaginator
 
-
-LIMIT_OF_POSTS = 10
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+MAX_AUTOCOMPLETE_QUERY = 100
 
 
+@conditional.page_condition(conditional.index_state)
+@query_budget(4)
 def index(request):
-    post_list = Post.objects.all()
-    context = dict(page_obj=pagination(request, post_list))
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = pagination(request, post_list)
+    thumbnails.resolve(page_obj)
+    context = dict(page_obj=page_obj)
     return render(request, 'posts/index.html', context)
 
 
+@conditional.page_condition(conditional.group_state)
+@query_budget(6)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = pagination(request, post_list)
+    thumbnails.resolve(page_obj)
     context = dict(
         group=group,
-        page_obj=pagination(request, post_list)
+        page_obj=page_obj
+    )
+    return render(request, 'posts/group_list.html', context)
+
+
+@conditional.page_condition(conditional.tag_state)
+@query_budget(4)
+def tag_posts(request, name):
+    tag = name.lower()
+    if not tags.is_valid(tag):
+        raise Http404
+    post_list = Post.objects.filter(tags__tag=tag).select_related(
+        'author', 'group'
+    )
+    page_obj = pagination(
+        request, post_list, tags.TagPaginator(tag, LIMIT_OF_POSTS)
+    )
+    thumbnails.resolve(page_obj)
+    context = dict(
+        tag=tag,
+        page_obj=page_obj
     )
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional.page_condition(conditional.profile_state)
+@query_budget(9)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    post_list = Post.objects.filter(author=author).select_related(
+        'author', 'group'
+    )
     following = False
     if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user, author=author)
+        following = Follow.objects.filter(
+            user=request.user, author=author
+        ).exists()
+    page_obj = pagination(request, post_list)
+    thumbnails.resolve(page_obj)
     context = dict(
         author=author,
-        page_obj=pagination(request, post_list),
-        following=following
+        page_obj=page_obj,
+        following=following,
+        suggestions=suggestions.for_user(request.user, exclude=author),
     )
     return render(request, 'posts/profile.html', context)
 
 
+@conditional.page_condition(conditional.post_detail_state, csrf=True)
+@query_budget(7)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    thumbnails.resolve([post])
+    comments = post.comments.select_related('author')
+    similar_posts = post.similar_posts.select_related(
+        'similar__author'
+    ).order_by('rank')
     form = CommentForm()
     context = dict(
         post=post,
         comments=comments,
+        similar_posts=similar_posts,
         form=form,
     )
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(6)
+def search(request):
+    form = SearchForm(request.GET or None)
+    query = filters = None
+    if form.is_valid():
+        query = form.cleaned_data['q']
+        filters = {
+            field: form.cleaned_data[field] for field in ('author', 'group')
+        }
+    expression = post_search.match_expression(query or '')
+    if not expression or not post_search.is_available():
+        return render(request, 'posts/search.html', {'form': form})
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    paginator = post_search.SearchPaginator(
+        expression,
+        LIMIT_OF_POSTS,
+        link_params=params.urlencode() + '&',
+        **filters,
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    thumbnails.resolve(page_obj)
+    authors, groups = post_search.facets(expression)
+    context = dict(
+        form=form,
+        query=query,
+        page_obj=page_obj,
+        authors=authors,
+        groups=groups,
+        filters=filters,
+    )
+    return render(request, 'posts/search.html', context)
+
+
+@require_safe
+def autocomplete(request):
+    results, complete = post_autocomplete.suggest(
+        request.GET.get('q', '')[:MAX_AUTOCOMPLETE_QUERY]
+    )
+    response = JsonResponse({'results': results, 'complete': complete})
+    # Неполный ответ браузер не должен запоминать: через миг индекс
+    # будет готов или хватит времени на весь диапазон.
+    response['Cache-Control'] = (
+        'private, max-age=60' if complete else 'no-store'
+    )
+    return response
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if not form.is_valid():
@@ -64,6 +174,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = PostForm(
@@ -84,6 +195,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -96,15 +208,27 @@ def add_comment(request, post_id):
 
 
 @login_required
+@conditional.page_condition(conditional.follow_state)
+@query_budget(7)
 def follow_index(request):
     follow_list_obj = Follow.objects.filter(user=request.user)
     follow_list_values = follow_list_obj.values_list("author", flat=True)
     post_list = Post.objects.filter(author__in=follow_list_values)
-    context = dict(page_obj=pagination(request, post_list))
+    page_obj = pagination(
+        request,
+        post_list,
+        TimelinePaginator(request.user, LIMIT_OF_POSTS)
+    )
+    thumbnails.resolve(page_obj)
+    context = dict(
+        page_obj=page_obj,
+        suggestions=suggestions.for_user(request.user),
+    )
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -114,14 +238,43 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.get(user=request.user, author=author).delete()
     return redirect('posts:profile', author.username)
 
 
-def pagination(request, post_list):
-    paginator = Paginator(post_list, LIMIT_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+@require_safe
+def resize_image(request, sign, width, height, name):
+    # Подпись ссылки вечная, поэтому, как и в media, проверяется, что
+    # картинка всё ещё принадлежит посту.
+    if (not resize.is_valid(sign, name, width, height)
+            or not post_media.is_served(name)):
+        raise Http404
+    try:
+        if not thumbnails.image_storage().exists(name):
+            raise Http404
+        path = resize.ensure(name, width, height)
+    except SuspiciousFileOperation:
+        raise Http404
+    return serve_file(request, path)
+
+
+@require_safe
+def media(request, name):
+    """Отдаёт картинку поста или её производный файл.
+
+    Файлы, которые не относятся ни к одному посту, недоступны сразу
+    после удаления поста, не дожидаясь сборщика мусора.
+    """
+    if not post_media.is_served(name):
+        raise Http404
+    try:
+        path = thumbnails.image_storage().path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    # Оригинал назван по хешу содержимого, а миниатюры переделываются
+    # под прежними именами.
+    cache_control = IMMUTABLE if is_sharded(name) else MEDIA_CACHE_CONTROL
+    return serve_file(request, path, cache_control)
@@ -115,13 +115,67 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кто передаёт байты файлов из MEDIA_ROOT: '' — сам Django,
+# 'x-sendfile' — Apache или lighttpd, 'x-accel-redirect' — nginx
+# через внутренний location MEDIA_ACCEL_PREFIX; см. core/http.py.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Файл общего кеша. Бэкенд распаковывает записи через pickle, поэтому
+# файл не должен лежать там, где его может подложить другой
+# пользователь. Тесты берут свой файл из yatube/test_settings.py.
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+)
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.layered.LayeredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# Защита от одновременного пересчёта кеша по имени фрагмента или
+# страницы; см. core/cache/stampede.py.
+CACHE_STAMPEDE = {
+    'default': {'lock': True, 'stale': 0, 'beta': 0.0},
+    'index_page': {'stale': 600, 'beta': 1.0},
+    'index_page_follow': {'stale': 600, 'beta': 1.0},
+    'about': {'stale': 3600, 'beta': 1.0},
+}
+
+# Загрузки пишутся кусками во временный файл; больше FILE_UPLOAD_MAX_SIZE
+# байт не сохраняется, а валидатор поля картинки такой файл отклоняет.
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.BoundedTemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+# Картинки больше этого числа пикселей отклоняются по заголовку,
+# до декодирования.
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Если задано, оригиналы с большей стороной длиннее этого уменьшаются
+# в пуле миниатюр; 0 — оставлять как есть.
+POST_IMAGE_DOWNSCALE_SIDE = int(os.getenv('POST_IMAGE_DOWNSCALE_SIDE', 0))
+
+# Сколько процессов готовят миниатюры картинок; 0 — в текущем процессе.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Словарь, IDF и матрица TF-IDF для build_similar_posts --incremental.
+SIMILAR_POSTS_MODEL = os.getenv(
+    'SIMILAR_POSTS_MODEL', os.path.join(BASE_DIR, 'similar_posts.npz')
+)
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [
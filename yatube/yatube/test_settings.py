@@ -0,0 +1,23 @@
+"""Настройки для тестов.
+
+Тесты очищают кеш, поэтому получают свой файл общего кеша в приватной
+временной директории и не трогают кеш запущенного сервера.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+TEST_CACHE_DIR = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, TEST_CACHE_DIR, True)
+
+CACHES = {
+    **CACHES,
+    'shared': {
+        **CACHES['shared'],
+        'LOCATION': os.path.join(TEST_CACHE_DIR, 'cache.sqlite3'),
+    },
+}
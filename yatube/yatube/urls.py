@@ -1,7 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 
 from core.views import page_not_found, server_error, csrf_failure
 
@@ -17,11 +16,6 @@ handler404 = page_not_found
 handler500 = server_error
 handler403 = csrf_failure
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
-
 if settings.DEBUG:
     import debug_toolbar
 